@@ -1,15 +1,45 @@
 import argparse
+import json
 import logging
 import sys
 from collections import ChainMap
 from copy import copy
+from datetime import datetime, timezone
 from io import TextIOWrapper
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Union
 
 import boto3
+from botocore.config import Config  # type: ignore
 from botocore.exceptions import ClientError  # type: ignore
 
-from .cloudformation import Stack
+from . import fleet, server
+from .cloudformation import (
+    DEFAULT_GRACE_PERIOD,
+    SUCCESSFUL_STACK_STATUSES,
+    Stack,
+    StackTimeoutError,
+    log,
+)
+from .history import DEFAULT_DATABASE, History
+from .notifications import NotificationListener
+from .preflight import check_template
+from .progress import DEFAULT_DURATIONS_FILE, DurationModel, ProgressTracker
+from .scheduler import DEFAULT_BURST, DEFAULT_CALLS_PER_SECOND, Scheduler
+from .sinks import EventSink
+from .summary import DEFAULT_SUMMARY_INTERVAL, SummaryReporter
+from .template import ParameterError, TemplateError
+from .watch import TemplateWatcher
+
+# The exit code used when a stack does not stabilise in time, as used by timeout(1)
+TIMEOUT_EXIT_CODE = 124
+
+# Options that only apply when the job is performed in this process, not by a server, by destination
+LOCAL_ONLY_OPTIONS = {
+    "watch_files": "--watch",
+    "progress": "--progress",
+    "timings": "--timings",
+    "notification_queue_url": "--notification-queue-url",
+}
 
 
 class ParseDict(argparse.Action):
@@ -33,18 +63,129 @@ class ParseDict(argparse.Action):
         setattr(namespace, self.dest, result)
 
 
-def deploy(
+def read_parameter_files(parameter_files: List[str]) -> Dict[str, str]:
+    """Read parameters from JSON files holding either an object of values, or a list of ParameterKey/ParameterValue
+    structures. Later files take precedence"""
+    parameters: Dict[str, str] = {}
+
+    for parameter_file in parameter_files:
+        with open(parameter_file, "r", encoding="utf-8") as parameters_json:
+            file_parameters = json.load(parameters_json)
+
+        if isinstance(file_parameters, list):
+            file_parameters = {
+                parameter["ParameterKey"]: parameter["ParameterValue"]
+                for parameter in file_parameters
+            }
+
+        parameters.update(file_parameters)
+
+    return parameters
+
+
+def deploy_template(
+    stack: Stack,
+    template_body: Union[str, Callable[[], str]],
+    parameters: Dict[str, str],
+    tags: Dict[str, str],
+    durations_file: Optional[str],
+):
+    """Deploy a template to the CloudFormation stack, tracking progress if a durations file is given"""
+    if not durations_file:
+        stack.deploy(template_body, parameters, tags)
+        return
+
+    tracker = ProgressTracker(DurationModel(durations_file), stack.name)
+    stack.add_sink(tracker)
+
+    try:
+        stack.deploy(template_body, parameters, tags)
+    finally:
+        stack.remove_sink(tracker)
+
+
+def start_notification_listener(
+    notification_queue_url: Optional[str],
+) -> Optional[NotificationListener]:
+    """Start listening for stack events on an SQS queue, if one is given"""
+    if not notification_queue_url:
+        return None
+
+    listener = NotificationListener(boto3.client("sqs"), notification_queue_url)
+    listener.start()
+
+    return listener
+
+
+def log_timings(stack: Stack):
+    """Log how long each step of the stack's last deploy took, and the time spent in each event sink"""
+    log(
+        "Timings: "
+        + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in stack.timings.items())
+    )
+    log(
+        "Event sinks: "
+        + ", ".join(f"{sink.name} {sink.elapsed:.2f}s" for sink in stack.sinks)
+    )
+
+
+def deploy(  # pylint: disable=too-many-arguments too-many-positional-arguments too-many-locals
     stack: Stack,
     template_file: TextIOWrapper,
     parameters: Dict[str, str],
+    parameter_files: List[str],
     tags: Dict[str, str],
     capabilities: List,
+    notification_arns: List,
+    notification_queue_url: Optional[str],
+    progress: bool,
+    durations_file: str,
+    watch_files: bool,
+    timings: bool,
+    auto_recover: bool,
+    skippable_resources: List[str],
 ):
     """Deploy the CloudFormation stack"""
+    if auto_recover:
+        stack.set_auto_recover(skippable_resources=skippable_resources)
+
     if capabilities:
         stack.set_capabilities(capabilities)
 
-    stack.deploy(template_file.read(), parameters, tags)
+    if notification_arns:
+        stack.set_notifications(
+            notification_arns, start_notification_listener(notification_queue_url)
+        )
+
+    progress_file = durations_file if progress else None
+
+    if watch_files and template_file is sys.stdin:
+        sys.exit("--watch requires the template to be read from a file")
+
+    def read_template() -> str:
+        if not watch_files:
+            return template_file.read()
+
+        with open(template_file.name, "r", encoding="utf-8") as current_template:
+            return current_template.read()
+
+    def deploy_once():
+        try:
+            deploy_template(
+                stack,
+                read_template,
+                {**read_parameter_files(parameter_files), **parameters},
+                tags,
+                progress_file,
+            )
+        finally:
+            if timings:
+                log_timings(stack)
+
+    if watch_files:
+        TemplateWatcher([template_file.name, *parameter_files], deploy_once).run()
+    else:
+        deploy_once()
 
 
 def delete(stack: Stack):
@@ -52,21 +193,241 @@ def delete(stack: Stack):
     stack.delete()
 
 
-def main():
-    """The main CLI entrypoint"""
-    logging.basicConfig(
-        datefmt="%Y-%m-%d %H:%M", format="[%(asctime)s] %(levelname)-2s: %(message)s"
+def watch(stack: Stack):
+    """Watch the CloudFormation stack until it stabilises"""
+    stack_status = stack.wait()
+    if stack_status not in SUCCESSFUL_STACK_STATUSES:
+        sys.exit(f"Stack {stack.name} is in {stack_status} status")
+
+
+def serve(listen: str, calls_per_second: float, burst: int, max_connections: int):
+    """Run a long-lived server that performs jobs using warm clients and a shared API budget"""
+    cloudformation = boto3.client(
+        "cloudformation", config=Config(max_pool_connections=max_connections)
     )
+    jobs = server.JobServer(cloudformation, Scheduler(calls_per_second, burst))
 
-    parser = argparse.ArgumentParser()
-    subparsers = parser.add_subparsers(
-        required=True,
-        help="The action to perform on the CloudFormation stack",
-        title="subcommands",
-        dest="action",
+    try:
+        job_server = server.create_server(listen, jobs)
+    except ValueError as exception:
+        sys.exit(str(exception))
+
+    with job_server:
+        log(f"Listening on {listen}")
+        job_server.serve_forever()
+
+
+def status(
+    prefix: Optional[str],
+    status_filter: List[str],
+    failure_reasons: bool,
+    concurrency: int,
+    output: str,
+):
+    """Print the status of every CloudFormation stack in the account, as it is listed"""
+    cloudformation = boto3.client(
+        "cloudformation", config=Config(max_pool_connections=max(concurrency, 10))
+    )
+    summaries = fleet.list_stacks(
+        cloudformation, prefix, fleet.expand_status_filter(status_filter)
     )
+    rows = (
+        fleet.with_failure_reasons(cloudformation, summaries, concurrency)
+        if failure_reasons
+        else ((summary, None) for summary in summaries)
+    )
+
+    try:
+        for summary, failure_reason in rows:
+            updated = summary.get("LastUpdatedTime", summary["CreationTime"])
+            reason = failure_reason or summary.get("StackStatusReason", "")
 
-    # create the parser for the "a" command
+            if output == "ndjson":
+                line = json.dumps(
+                    {
+                        "stack_name": summary["StackName"],
+                        "stack_status": summary["StackStatus"],
+                        "updated": updated.isoformat(),
+                        "reason": reason,
+                    }
+                )
+            else:
+                line = f"{summary['StackName']:<48} {summary['StackStatus']:<44} {updated:%Y-%m-%d %H:%M}  {reason}"
+
+            print(line, flush=True)
+    except ClientError as exception:
+        sys.exit(str(exception))
+
+
+def check(template_file: TextIOWrapper):
+    """Check a CloudFormation template offline, printing every problem found"""
+    violations = check_template(template_file.read())
+    for violation in violations:
+        print(violation)
+
+    if violations:
+        sys.exit(1)
+
+
+def submit(
+    address: str,
+    action: str,
+    stack_name: str,
+    template_file=None,
+    parameter_files=(),
+    **job,
+) -> bool:
+    """Submit a deploy/delete/watch job to a running cfn-sync server"""
+    request = {"action": action, "stack_name": stack_name, **job}
+    if template_file:
+        request["template_body"] = template_file.read()
+    if parameter_files:
+        request["parameters"] = {
+            **read_parameter_files(parameter_files),
+            **request["parameters"],
+        }
+
+    return server.submit(address, request)
+
+
+def perform(func: Callable, stack_name: str, args: Dict):
+    """Perform a deploy/delete/watch action against the stack in this process"""
+    summary_interval = args.pop("summary_interval")
+    summary = args.pop("output") == "summary"
+
+    # Summaries replace the default logging of every event
+    stack = Stack(
+        boto3.client("cloudformation"), stack_name, sinks=[] if summary else None
+    )
+    if summary:
+        stack.add_sink(SummaryReporter(stack.resources, summary_interval))
+    stack.set_timeout(
+        args.pop("timeout"),
+        args.pop("deadline"),
+        args.pop("cancel_on_timeout"),
+        args.pop("grace_period"),
+    )
+
+    try:
+        func(stack=stack, **args)
+
+    except StackTimeoutError as exception:
+        print(exception, file=sys.stderr)
+        sys.exit(TIMEOUT_EXIT_CODE)
+
+    except (ClientError, ParameterError, TemplateError) as exception:
+        sys.exit(str(exception))
+
+
+def history_sync(stack_names: List[str], database: str):
+    """Store the new events of each CloudFormation stack in the local history database"""
+    cloudformation = boto3.client("cloudformation")
+
+    with History(database) as history:
+        for stack_name in stack_names:
+            try:
+                count = history.sync(cloudformation, stack_name)
+            except ClientError as exception:
+                sys.exit(str(exception))
+
+            log(f"{stack_name} - {count} new events")
+
+
+def history_query(query: str, stack_names: List[str], limit: int, database: str):
+    """Print an aggregate of the local history database"""
+    with History(database) as history:
+        if query == "deploys":
+            for deploy_run in history.deploys(stack_names):
+                print(
+                    f"{deploy_run['started']:%Y-%m-%d %H:%M}  {deploy_run['stack_name']}"
+                    f"  {deploy_run['operation']}  {deploy_run['duration']:.0f}s  {deploy_run['status']}"
+                )
+        elif query == "resource-types":
+            for resource_type in history.slowest_resource_types(limit):
+                print(
+                    f"{resource_type['resource_type']}  average {resource_type['average_duration']:.0f}s"
+                    f"  max {resource_type['max_duration']:.0f}s  ({resource_type['count']} observed)"
+                )
+        else:
+            for failure in history.failure_reasons(stack_names, limit):
+                print(f"{failure['count']}  {failure['reason']}")
+
+
+def add_server_argument(parser: argparse.ArgumentParser):
+    """Adds the --server argument used to submit a job to a running cfn-sync server"""
+    parser.add_argument(
+        "--server",
+        type=str,
+        help="Submit the job to a running `cfn-sync serve` at this HOST:PORT or Unix socket path, instead of"
+        " performing it in this process.",
+        default=None,
+    )
+
+
+def parse_deadline(value: str) -> float:
+    """Parse an ISO 8601 date and time into a Unix timestamp, assuming UTC if no time zone is given"""
+    try:
+        deadline = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError as exception:
+        raise argparse.ArgumentTypeError(
+            f"invalid ISO 8601 date and time: {value}"
+        ) from exception
+
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=timezone.utc)
+
+    return deadline.timestamp()
+
+
+def add_timeout_arguments(parser: argparse.ArgumentParser):
+    """Adds the arguments that limit how long to wait for a stack"""
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Stop waiting for the stack after this many seconds. With --auto-recover, this also covers recovering"
+        " the stack and retrying the deploy.",
+        default=None,
+    )
+    parser.add_argument(
+        "--deadline",
+        type=parse_deadline,
+        help="Stop waiting for the stack at this ISO 8601 date and time (UTC unless a time zone is given), e.g. to"
+        " share one deadline between the stacks of a multi-stack run.",
+        default=None,
+    )
+    parser.add_argument(
+        "--cancel-on-timeout",
+        action="store_true",
+        help="Cancel an update that is still in progress when the timeout or deadline is reached, and wait for it to"
+        " roll back.",
+    )
+    parser.add_argument(
+        "--grace-period",
+        type=float,
+        help="The number of seconds to wait for a cancelled update to roll back.",
+        default=DEFAULT_GRACE_PERIOD,
+    )
+
+
+def add_output_arguments(parser: argparse.ArgumentParser):
+    """Adds the arguments that choose how stack events are logged"""
+    parser.add_argument(
+        "--output",
+        choices=["events", "summary"],
+        help="Log every stack event, or a periodic summary of resource statuses along with each failure. Summaries"
+        " are only available when the job is performed in this process.",
+        default="events",
+    )
+    parser.add_argument(
+        "--summary-interval",
+        type=float,
+        help="The minimum number of seconds between summaries.",
+        default=DEFAULT_SUMMARY_INTERVAL,
+    )
+
+
+def add_deploy_parser(subparsers):
+    """Adds the "deploy" subcommand"""
     parser_deploy = subparsers.add_parser("deploy", help="Deploy CloudFormation stack")
     parser_deploy.set_defaults(func=deploy)
     parser_deploy.add_argument(
@@ -94,6 +455,14 @@ def main():
         metavar="ParameterKey=ParameterValue",
         default={},
     )
+    parser_deploy.add_argument(
+        "--parameter-files",
+        nargs="+",
+        type=str,
+        help="A list of JSON files holding parameters, as either an object of ParameterKey: ParameterValue or a list of"
+        " ParameterKey/ParameterValue structures. --parameter-overrides take precedence over these.",
+        default=[],
+    )
     parser_deploy.add_argument(
         "--tags",
         nargs="+",
@@ -110,7 +479,65 @@ def main():
         help="A list of capabilities that you must specify before AWS Cloudformation can create certain stacks.",
         default=[],
     )
+    parser_deploy.add_argument(
+        "--notification-arns",
+        nargs="+",
+        type=str,
+        help="A list of Amazon SNS topic ARNs that AWS CloudFormation publishes stack events to.",
+        default=[],
+    )
+    parser_deploy.add_argument(
+        "--notification-queue-url",
+        type=str,
+        help="The URL of an Amazon SQS queue subscribed to the --notification-arns topics. When set, stack events are"
+        " received from the queue instead of by polling CloudFormation.",
+        default=None,
+    )
+    parser_deploy.add_argument(
+        "--progress",
+        action="store_true",
+        help="Log the percent complete, estimated time remaining and unusually slow resources while waiting, based"
+        " on the durations observed by previous successful deploys.",
+    )
+    parser_deploy.add_argument(
+        "--durations-file",
+        type=str,
+        help="The path of the file used to keep observed durations for --progress.",
+        default=DEFAULT_DURATIONS_FILE,
+    )
+    parser_deploy.add_argument(
+        "--watch",
+        dest="watch_files",
+        action="store_true",
+        help="Stay running, and deploy again whenever the template or parameter files change.",
+    )
+    parser_deploy.add_argument(
+        "--timings",
+        action="store_true",
+        help="Log how long each step of the deploy took.",
+    )
+    parser_deploy.add_argument(
+        "--auto-recover",
+        action="store_true",
+        help="If the stack is (or ends up) in UPDATE_ROLLBACK_FAILED status, continue the rollback and then retry"
+        " the deploy once.",
+    )
+    parser_deploy.add_argument(
+        "--skippable-resources",
+        nargs="+",
+        type=str,
+        help="The logical IDs of resources that --auto-recover may skip if they failed to roll back. Other resources"
+        " that failed to roll back are retried.",
+        metavar="LogicalResourceId",
+        default=[],
+    )
+    add_server_argument(parser_deploy)
+    add_timeout_arguments(parser_deploy)
+    add_output_arguments(parser_deploy)
+
 
+def add_delete_parser(subparsers):
+    """Adds the "delete" subcommand"""
     parser_delete = subparsers.add_parser("delete", help="Delete CloudFormation stack")
     parser_delete.set_defaults(func=delete)
     parser_delete.add_argument(
@@ -119,17 +546,226 @@ def main():
         help="The name or the unique stack ID that is associated with the stack.",
         required=True,
     )
+    add_server_argument(parser_delete)
+    add_timeout_arguments(parser_delete)
+    add_output_arguments(parser_delete)
+
+
+def add_watch_parser(subparsers):
+    """Adds the "watch" subcommand"""
+    parser_watch = subparsers.add_parser(
+        "watch", help="Watch CloudFormation stack until it stabilises"
+    )
+    parser_watch.set_defaults(func=watch)
+    parser_watch.add_argument(
+        "--stack-name",
+        type=str,
+        help="The name or the unique stack ID that is associated with the stack.",
+        required=True,
+    )
+    add_server_argument(parser_watch)
+    add_timeout_arguments(parser_watch)
+    add_output_arguments(parser_watch)
+
+
+def add_serve_parser(subparsers):
+    """Adds the "serve" subcommand"""
+    parser_serve = subparsers.add_parser(
+        "serve", help="Run a server that performs deploy/delete/watch jobs"
+    )
+    parser_serve.set_defaults(func=serve)
+    parser_serve.add_argument(
+        "--listen",
+        type=str,
+        help="The loopback HOST:PORT (e.g. localhost:8000) or Unix socket path to listen on. Jobs aren't"
+        " authenticated, so other addresses are rejected.",
+        required=True,
+    )
+    parser_serve.add_argument(
+        "--calls-per-second",
+        type=float,
+        help="The CloudFormation API call budget shared by every job.",
+        default=DEFAULT_CALLS_PER_SECOND,
+    )
+    parser_serve.add_argument(
+        "--burst",
+        type=int,
+        help="The number of API calls that may be made at once before the budget applies.",
+        default=DEFAULT_BURST,
+    )
+    parser_serve.add_argument(
+        "--max-connections",
+        type=int,
+        help="The size of the pool of connections kept open to CloudFormation.",
+        default=10,
+    )
+
+
+def add_status_parser(subparsers):
+    """Adds the "status" subcommand"""
+    parser_status = subparsers.add_parser(
+        "status", help="List the status of every CloudFormation stack in the account"
+    )
+    parser_status.set_defaults(func=status)
+    parser_status.add_argument(
+        "--prefix",
+        type=str,
+        help="Only list stacks whose names start with this prefix.",
+        default=None,
+    )
+    parser_status.add_argument(
+        "--status-filter",
+        nargs="+",
+        type=str,
+        help="Only list stacks in these statuses. Accepts stack statuses, or the groups: in-progress, failed, complete."
+        " Defaults to every stack that has not been deleted.",
+        default=[],
+    )
+    parser_status.add_argument(
+        "--failure-reasons",
+        action="store_true",
+        help="Look up the reason the most recent resource failed for each failed stack.",
+    )
+    parser_status.add_argument(
+        "--concurrency",
+        type=int,
+        help="The number of failure reasons to look up at once.",
+        default=fleet.DEFAULT_CONCURRENCY,
+    )
+    parser_status.add_argument(
+        "--output",
+        choices=["table", "ndjson"],
+        help="Print a table, or one JSON object per line.",
+        default="table",
+    )
+
+
+def add_check_parser(subparsers):
+    """Adds the "check" subcommand"""
+    parser_check = subparsers.add_parser(
+        "check", help="Check a CloudFormation template offline, without calling AWS"
+    )
+    parser_check.set_defaults(func=check)
+    parser_check.add_argument(
+        "--template-file",
+        type=argparse.FileType("r"),
+        help="The path where your AWS CloudFormation template is located.",
+        required=True,
+    )
+
+
+def add_history_parser(subparsers):
+    """Adds the "history" subcommand"""
+    parser_history = subparsers.add_parser(
+        "history", help="Record and query CloudFormation stack event history"
+    )
+    history_subparsers = parser_history.add_subparsers(
+        required=True, title="history subcommands", dest="subaction"
+    )
+
+    parser_sync = history_subparsers.add_parser(
+        "sync", help="Store new stack events in the local history database"
+    )
+    parser_sync.set_defaults(func=history_sync)
+    parser_sync.add_argument(
+        "--stack-names",
+        nargs="+",
+        type=str,
+        help="The names of the stacks to store the events of.",
+        required=True,
+    )
+
+    parser_query = history_subparsers.add_parser(
+        "query", help="Query the local history database"
+    )
+    parser_query.set_defaults(func=history_query)
+    parser_query.add_argument(
+        "query",
+        choices=["deploys", "resource-types", "failures"],
+        help="deploys: each create/update/delete and its duration, oldest first. resource-types: the slowest"
+        " resource types to stabilise. failures: the most common failure reasons.",
+    )
+    parser_query.add_argument(
+        "--stack-names",
+        nargs="+",
+        type=str,
+        help="Only include these stacks (not applicable to resource-types).",
+        default=[],
+    )
+    parser_query.add_argument(
+        "--limit",
+        type=int,
+        help="The maximum number of resource types or failure reasons to show.",
+        default=10,
+    )
+
+    for history_parser in (parser_sync, parser_query):
+        history_parser.add_argument(
+            "--database",
+            type=str,
+            help="The path of the local history database.",
+            default=DEFAULT_DATABASE,
+        )
+
+
+def check_server_options(parser: argparse.ArgumentParser, args: Dict):
+    """Exits with a usage error if options that only apply in this process are combined with --server"""
+    local_only = [
+        option
+        for destination, option in LOCAL_ONLY_OPTIONS.items()
+        if args.get(destination)
+    ]
+    if args.get("output") == "summary":
+        local_only.append("--output summary")
+
+    if local_only:
+        parser.error(f"{', '.join(local_only)} can't be used with --server")
+
+
+def main():
+    """The main CLI entrypoint"""
+    logging.basicConfig(
+        datefmt="%Y-%m-%d %H:%M", format="[%(asctime)s] %(levelname)-2s: %(message)s"
+    )
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(
+        required=True,
+        help="The action to perform on the CloudFormation stack",
+        title="subcommands",
+        dest="action",
+    )
+    for add_parser in (
+        add_deploy_parser,
+        add_delete_parser,
+        add_watch_parser,
+        add_serve_parser,
+        add_status_parser,
+        add_check_parser,
+        add_history_parser,
+    ):
+        add_parser(subparsers)
 
     args = vars(parser.parse_args())
 
-    args.pop("action")
+    action = args.pop("action")
+    args.pop("subaction", None)
     func = args.pop("func")
-    stack_name = args.pop("stack_name")
 
-    stack = Stack(boto3.client("cloudformation"), stack_name)
+    if "stack_name" not in args:
+        func(**args)
+        return
 
-    try:
-        func(stack=stack, **args)
+    stack_name = args.pop("stack_name")
+    address = args.pop("server")
 
-    except ClientError as exception:
-        sys.exit(exception)
+    if address:
+        check_server_options(parser, args)
+        try:
+            if not submit(address, action, stack_name, **args):
+                sys.exit(1)
+        except StackTimeoutError:
+            sys.exit(TIMEOUT_EXIT_CODE)
+        return
+
+    perform(func, stack_name, args)
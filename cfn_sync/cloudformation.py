@@ -1,9 +1,20 @@
 import logging
+import queue
 import time
-from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
 
 from botocore.exceptions import ClientError  # type: ignore
 
+from .events import StackEvent
+from .notifications import NotificationListener
+from .preflight import preflight
+from .registry import StackRegistry
+from .resources import ResourceIndex
+from .scheduler import Scheduler
+from .sinks import DEFAULT_FLUSH_TIMEOUT, CallbackSink, EventSink
+from .template import merge_parameters, parse_template
+
 if TYPE_CHECKING:  # pragma: no cover
     from mypy_boto3_cloudformation.client import CloudFormationClient
 else:
@@ -28,6 +39,7 @@ SUCCESSFUL_STACK_STATUSES = frozenset(
     {"CREATE_COMPLETE", "UPDATE_COMPLETE", "IMPORT_COMPLETE", "DELETE_COMPLETE"}
 )
 DEFAULT_WAIT_DELAY = 5
+DEFAULT_GRACE_PERIOD = 300
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -49,23 +61,61 @@ def log(message: str):
     logger.info(message)
 
 
-class Stack:
+class LogSink(EventSink):
+    """Sink that logs each stack event, which is how cfn-sync reports events by default"""
+
+    def on_event(self, event: StackEvent):
+        log_event(event.logical_resource_id, event.resource_status, event.status_reason)
+
+
+class StackTimeoutError(RuntimeError):
+    """Raised when a stack does not stabilise before its timeout or deadline"""
+
+
+class Stack:  # pylint: disable=too-many-instance-attributes
     """Class that holds information about a CloudFormation stack, and can perform updates to it"""
 
     name: str
     id: Optional[str]
     capabilities: Optional[List] = None
+    notification_arns: Optional[List] = None
+    notifications: Optional[NotificationListener] = None
     wait_delay: int
-
-    def __init__(
+    scheduler: Optional[Scheduler]
+    registry: Optional[StackRegistry]
+    sinks: List[EventSink]
+    timings: Dict[str, float]
+    resources: ResourceIndex
+    timeout: Optional[float] = None
+    deadline: Optional[float] = None
+    cancel_on_timeout: bool = False
+    grace_period: float = DEFAULT_GRACE_PERIOD
+    auto_recover: bool = False
+    skippable_resources: List[str]
+
+    def __init__(  # pylint: disable=too-many-arguments too-many-positional-arguments
         self,
         cloudformation: CloudFormationClient,
         name: str,
         wait_delay: int = DEFAULT_WAIT_DELAY,
+        scheduler: Optional[Scheduler] = None,
+        registry: Optional[StackRegistry] = None,
+        sinks: Optional[List[EventSink]] = None,
     ):
         self.cloudformation = cloudformation
         self.name = name
         self.wait_delay = wait_delay
+        self.scheduler = scheduler
+        self.registry = registry
+        self.sinks = list(sinks) if sinks is not None else [LogSink()]
+        self.timings = {}
+        self.resources = ResourceIndex()
+        self.skippable_resources = []
+        self.__expires: Optional[float] = None
+        # Whether waits keep the expiry of the previous wait, e.g. while recovering and retrying a deploy
+        self.__expiry_shared = False
+        self.__cancelled = False
+        self.__status: Optional[str] = None
 
     @property
     def status(self) -> str:
@@ -75,130 +125,531 @@ class Stack:
     @property
     def exists(self) -> bool:
         """Checks if the stack currently exists or not"""
-        try:
-            self.__describe()
-
-            return True
-        except ClientError as exception:
-            exception_message = str(exception)
-
-            if "does not exist" in exception_message:
-                return False
-
-            raise exception
+        return self.__describe_if_exists() is not None
 
     def set_capabilities(self, capabilities: List):
         """Sets the capabilities to apply to the stack during deploy [create/update] actions"""
         self.capabilities = capabilities
 
+    def set_notifications(
+        self,
+        notification_arns: List,
+        listener: Optional[NotificationListener] = None,
+    ):
+        """Sets the SNS topics to publish stack events to during deploy actions, and optionally a listener
+        subscribed to them, which is used to wait for events instead of polling for them
+        """
+        self.notification_arns = notification_arns
+        self.notifications = listener
+
+    def set_timeout(
+        self,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        cancel: bool = False,
+        grace_period: float = DEFAULT_GRACE_PERIOD,
+    ):
+        """Limits how long each wait may take, in seconds, and/or sets a deadline (a Unix timestamp) for all of them
+
+        When the time runs out a StackTimeoutError is raised. If cancel is set an update in progress is cancelled
+        first, and its rollback is followed for up to the grace period.
+        """
+        self.timeout = timeout
+        self.deadline = deadline
+        self.cancel_on_timeout = cancel
+        self.grace_period = grace_period
+
+    def set_auto_recover(
+        self, enabled: bool = True, skippable_resources: Optional[List[str]] = None
+    ):
+        """Sets whether a deploy recovers the stack from UPDATE_ROLLBACK_FAILED and tries again, and which resources
+        (by logical ID) may be skipped when continuing a rollback that failed on them"""
+        self.auto_recover = enabled
+        self.skippable_resources = skippable_resources or []
+
+    def add_sink(self, sink: EventSink):
+        """Registers a sink to receive stack events and status changes while waiting"""
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink: EventSink):
+        """Stops a sink from receiving stack events"""
+        self.sinks.remove(sink)
+
     def deploy(
         self,
-        template_body: str,
+        template_body: Union[str, Callable[[], str]],
         parameters: Dict,
         tags: Dict,
         wait: bool = True,
     ):
-        """Performs a create/update against the stack and optionally waits for it to stabilise"""
-        try:
-            if self.exists:
-                logger.debug("Stack exists - setting method to update_stack")
-                method: Callable = self.cloudformation.update_stack
-            else:
-                logger.debug("Stack does not exist - setting method to create_stack")
-                method = self.cloudformation.create_stack
-
-            response = method(
-                StackName=self.name,
-                TemplateBody=template_body,
-                Parameters=[
-                    {"ParameterKey": key, "ParameterValue": value}
-                    for key, value in parameters.items()
-                ],
-                Tags=[{"Key": key, "Value": value} for key, value in tags.items()],
-                Capabilities=self.capabilities or [],
-            )
-            self.id = response["StackId"]
-        except ClientError as client_error:
-            if (
-                client_error.response["Error"]["Message"]
-                == "No updates are to be performed."
-            ):
-                log(f"No changes. Stack {self.name} not updated")
-                return
+        """Performs a create/update against the stack and optionally waits for it to stabilise
 
-            raise client_error
+        The template body may be given as a callable that prepares it, which is run (and the result checked) while
+        the stack is described. Otherwise the template is checked before calling CloudFormation at all. Either way,
+        a PreflightError listing every problem found is raised before anything is created or updated. Parameters the
+        template declares but that aren't given keep their previous value on an update, and a ParameterError is
+        raised before calling CloudFormation if parameters are unknown to the template or missing.
 
-        if wait:
-            self.wait()
+        With auto recovery enabled, a stack left in UPDATE_ROLLBACK_FAILED (before the deploy, or by it) is
+        recovered, and the deploy is then tried once more. The recovery and retry share the timeout of the deploy's
+        first wait, rather than each having a timeout of their own.
+        """
+        self.timings = {}
 
-            stack_status = self.status
+        body, description = self.__prepare_and_describe(template_body)
+        request = self.__request(body, parameters, tags, description)
 
-            if stack_status not in SUCCESSFUL_STACK_STATUSES:
-                raise RuntimeError(
-                    f"Stack did not deploy successfully: {self.name} is in {stack_status} status"
-                )
+        try:
+            stack_status = self.__submit_and_wait(request, description, wait)
+        finally:
+            self.__expiry_shared = False
+
+        if stack_status and stack_status not in SUCCESSFUL_STACK_STATUSES:
+            raise RuntimeError(
+                f"Stack did not deploy successfully: {self.name} is in {stack_status} status"
+            )
 
     def delete(self, wait: bool = True):
         """Performs a delete against the stack and optionally waits for it to complete"""
         self.id = self.__describe()["StackId"]
+        self.__acquire()
         self.cloudformation.delete_stack(StackName=self.name)
+        self.__invalidate()
 
         if wait:
-            self.wait()
-
-            stack_status = self.status
+            stack_status = self.wait("DELETE_IN_PROGRESS")
 
             if stack_status not in SUCCESSFUL_STACK_STATUSES:
                 raise RuntimeError(
                     f"Stack did not delete successfully: {self.name} is in {stack_status} status"
                 )
 
-    def wait(self):
-        """Waits for a stack create/update to complete, logging each event while waiting"""
-        stack_status = self.status
+    def recover(self, failed_resources: Optional[List[str]] = None) -> str:
+        """Continues rolling back an update whose rollback failed, and waits for the rollback to complete
+
+        The logical IDs of the resources that failed to roll back may be given from the index kept by the wait that
+        ended in UPDATE_ROLLBACK_FAILED. Otherwise they are found from the stack's events since its latest rollback
+        started. Those on the skippable resources allow-list are skipped, provided they are in UPDATE_FAILED, the only
+        status CloudFormation allows to be skipped. Raises a RuntimeError if the stack does not reach
+        UPDATE_ROLLBACK_COMPLETE. Returns the final status.
+        """
+        index = self.resources if failed_resources is not None else self.__rollback()
+        failed = failed_resources if failed_resources is not None else index.failed()
+        skipped = [
+            resource
+            for resource in failed
+            if resource in self.skippable_resources
+            and resource in index
+            and index[resource].status == "UPDATE_FAILED"
+        ]
+        if failed:
+            log(f"Resources that failed to roll back: {', '.join(failed)}")
+        if len(skipped) < len(failed):
+            log("Resources that are not skippable will be retried")
+
+        log(f"Continuing the rollback of stack {self.name}")
+        request: Dict = {"StackName": getattr(self, "id", self.name)}
+        if skipped:
+            request["ResourcesToSkip"] = skipped
+
+        self.__acquire()
+        self.cloudformation.continue_update_rollback(**request)
+        self.__invalidate()
+
+        stack_status = self.wait("UPDATE_ROLLBACK_IN_PROGRESS")
+        if stack_status != "UPDATE_ROLLBACK_COMPLETE":
+            raise RuntimeError(
+                f"Stack did not recover: {self.name} is in {stack_status} status"
+            )
+
+        return stack_status
+
+    def wait(
+        self,
+        stack_status: Optional[str] = None,
+        on_event: Optional[Callable[[StackEvent], None]] = None,
+    ) -> str:
+        """Waits for a stack create/update to complete, passing each event to the sinks. Returns the final status
+
+        A caller that already knows the stack's status (e.g. having just submitted an update) may pass it in to save
+        describing the stack before the first wait. A callable passed as on_event receives this wait's events along
+        with the sinks. The state of each resource seen changing is kept in `resources`. Sinks that run on threads
+        of their own are given a limited time to catch up before returning.
+        """
+        sink = CallbackSink(on_event) if on_event else None
+        if sink:
+            self.add_sink(sink)
+        if self.registry:
+            self.registry.track(getattr(self, "id", self.name))
+
+        try:
+            stack_status = self.__wait(stack_status)
+            self.__dispatch("on_finish", self.name, stack_status)
+        finally:
+            self.__flush_sinks()
+            if self.registry:
+                self.registry.untrack(getattr(self, "id", self.name))
+            if sink:
+                self.remove_sink(sink)
+
+        return stack_status
+
+    def __wait(self, stack_status: Optional[str]) -> str:
+        """Waits for the stack to stabilise, logging each event"""
+        if not self.__expiry_shared:
+            self.__expires = self.__expiry()
+        self.__cancelled = False
+        self.resources.clear()
+        self.__status = None
+
+        stack_status = self.__observe(stack_status or self.status)
         events = self.events()
 
         event_ids = [event["EventId"] for event in events]
 
         for event in reversed(events[:1]):
-            log_event(
-                event["LogicalResourceId"],
-                event["ResourceStatus"],
-                event.get("ResourceStatusReason", None),
-            )
+            self.__emit(event)
+
+        if self.notifications:
+            return self.__wait_for_notifications(stack_status, event_ids)
 
         while stack_status in IN_PROGRESS_STACK_STATUSES:
-            time.sleep(self.wait_delay)
+            self.__check_expiry(stack_status)
+            time.sleep(min(self.wait_delay, self.__remaining()))
+            stack_status = self.__observe(self.__catch_up(event_ids))
 
-            events = filter(
-                lambda event: event["EventId"] not in event_ids,
-                reversed(self.events()),
-            )
+        return self.__check_cancelled(stack_status)
 
-            for event in events:
-                log_event(
-                    event["LogicalResourceId"],
-                    event["ResourceStatus"],
-                    event.get("ResourceStatusReason", None),
-                )
+    def __wait_for_notifications(self, stack_status: str, event_ids: List[str]) -> str:
+        """Waits for a stack create/update to complete using events pushed to the notification listener,
+        polling only as a periodic consistency check"""
+        assert self.notifications
+        stack_identifiers = {self.name, getattr(self, "id", self.name)}
+        events = self.notifications.register(*stack_identifiers)
+        check_interval = self.notifications.consistency_check_interval
+        next_check = time.monotonic() + check_interval
+
+        try:
+            while stack_status in IN_PROGRESS_STACK_STATUSES:
+                self.__check_expiry(stack_status)
+                try:
+                    event = events.get(
+                        timeout=max(
+                            0, min(next_check - time.monotonic(), self.__remaining())
+                        )
+                    )
+                except queue.Empty:
+                    if time.monotonic() < next_check:
+                        continue
+
+                    stack_status = self.__observe(self.__catch_up(event_ids))
+                    next_check = time.monotonic() + check_interval
+                    continue
+
+                if event["EventId"] in event_ids:
+                    continue
+
+                self.__emit(event)
+                event_ids.append(event["EventId"])
+
+                if event.get("PhysicalResourceId") == event.get("StackId"):
+                    stack_status = self.__observe(event["ResourceStatus"])
+        finally:
+            self.notifications.unregister(*stack_identifiers)
+
+        return self.__check_cancelled(stack_status)
+
+    def __catch_up(self, event_ids: List[str]) -> str:
+        """Emits the stack's events that have not been seen yet, oldest first, and returns its current status"""
+        for event in reversed(self.events()):
+            if event["EventId"] not in event_ids:
+                self.__emit(event)
                 event_ids.append(event["EventId"])
 
-            stack_status = self.status
+        return self.status
 
     def events(self) -> Dict:
         """Get the first page of events for the stack"""
         described_name = getattr(self, "id", self.name)
 
+        self.__acquire()
         stack_events = self.cloudformation.describe_stack_events(
             StackName=described_name
         )
 
         return stack_events["StackEvents"]  # type: ignore
 
+    def __describe_if_exists(self) -> Optional[Dict]:
+        """Call CloudFormation DescribeStack, returning None if the stack does not exist"""
+        try:
+            return self.__describe()
+        except ClientError as exception:
+            exception_message = str(exception)
+
+            if "does not exist" in exception_message:
+                return None
+
+            raise exception
+
+    def __submit_changes(self, request: Dict, exists: bool) -> Optional[str]:
+        """Submits the create/update. Returns the status the stack is now in, or None if there was nothing to
+        update"""
+        try:
+            return self.__submit(request, exists)
+        except ClientError as client_error:
+            if (
+                client_error.response["Error"]["Message"]
+                == "No updates are to be performed."
+            ):
+                log(f"No changes. Stack {self.name} not updated")
+                return None
+
+            raise client_error
+
+    def __submit_and_wait(
+        self, request: Dict, description: Optional[Dict], wait: bool
+    ) -> Optional[str]:
+        """Submits the create/update and optionally waits for it, recovering from UPDATE_ROLLBACK_FAILED (if
+        enabled) and retrying once. Returns the final status, or None if there was nothing to wait for
+        """
+        recovered = False
+        if (
+            self.auto_recover
+            and description
+            and description["StackStatus"] == "UPDATE_ROLLBACK_FAILED"
+        ):
+            self.id = description["StackId"]
+            self.__timed("recover", self.recover)
+            self.__expiry_shared = True
+            recovered = True
+
+        stack_status = self.__timed(
+            "submit", self.__submit_changes, request, description is not None
+        )
+        if not stack_status or not wait:
+            return None
+
+        stack_status = self.__timed("wait", self.wait, stack_status)
+        if (
+            not self.auto_recover
+            or recovered
+            or stack_status != "UPDATE_ROLLBACK_FAILED"
+        ):
+            return stack_status
+
+        self.__expiry_shared = True
+        self.__timed("recover", self.recover, self.resources.failed())
+        log(f"Retrying the deploy of stack {self.name}")
+        stack_status = self.__timed("retry", self.__submit_changes, request, True)
+
+        return stack_status and self.__timed("retry wait", self.wait, stack_status)
+
+    def __rollback(self) -> ResourceIndex:
+        """Returns an index of the resources changed by the stack's latest rollback, from the events since the
+        rollback started on its latest page of events"""
+        events: List[StackEvent] = []
+        for event in map(StackEvent, self.events()):
+            if (
+                event.is_stack_event
+                and event.resource_status == "UPDATE_ROLLBACK_IN_PROGRESS"
+            ):
+                break
+            events.append(event)
+
+        index = ResourceIndex()
+        for event in reversed(events):
+            index.update(event)
+
+        return index
+
+    def __submit(self, request: Dict, exists: bool) -> str:
+        """Updates the stack if it exists, falling back to creating it if it turns out not to. Returns the status
+        the stack is now in"""
+        if exists:
+            logger.debug("Stack exists - updating")
+            try:
+                self.__acquire()
+                self.id = self.cloudformation.update_stack(**request)["StackId"]
+                self.__invalidate()
+
+                return "UPDATE_IN_PROGRESS"
+            except ClientError as exception:
+                if "does not exist" not in str(exception):
+                    raise exception
+
+        logger.debug("Stack does not exist - creating")
+        self.__acquire()
+        self.id = self.cloudformation.create_stack(**request)["StackId"]
+        self.__invalidate()
+
+        return "CREATE_IN_PROGRESS"
+
+    def __prepare_and_describe(
+        self, template_body: Union[str, Callable[[], str]]
+    ) -> Tuple[str, Optional[Dict]]:
+        """Prepares and checks the template, and describes the stack (if it exists)
+
+        A template that must be prepared is prepared and checked while the stack is described. Otherwise it is
+        checked before the describe, so an invalid template doesn't cost an API call.
+        """
+        if not callable(template_body):
+            body = self.__prepare(template_body)
+            return body, self.__timed("describe", self.__describe_if_exists)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            prepared = executor.submit(self.__prepare, template_body)
+            description = self.__timed("describe", self.__describe_if_exists)
+            return prepared.result(), description
+
+    def __prepare(self, template_body: Union[str, Callable[[], str]]) -> str:
+        """Prepares the template body, if given as a callable, and checks it offline. Returns the body"""
+        body = (
+            self.__timed("prepare", template_body)
+            if callable(template_body)
+            else template_body
+        )
+        self.__timed("preflight", preflight, body)
+
+        return body
+
+    def __request(
+        self,
+        template_body: str,
+        parameters: Dict,
+        tags: Dict,
+        description: Optional[Dict],
+    ) -> Dict:
+        """Builds the create/update request"""
+        request = {
+            "StackName": self.name,
+            "TemplateBody": template_body,
+            "Parameters": self.__parameters(template_body, parameters, description),
+            "Tags": [{"Key": key, "Value": value} for key, value in tags.items()],
+            "Capabilities": self.capabilities or [],
+        }
+        if self.notification_arns:
+            request["NotificationARNs"] = self.notification_arns
+
+        return request
+
+    def __parameters(
+        self, template_body: str, parameters: Dict, description: Optional[Dict]
+    ) -> List[Dict]:
+        """Merges the given parameters with those the template declares and the stack's previous values"""
+        declared = parse_template(template_body).get("Parameters") or {}
+        previous = [
+            parameter["ParameterKey"]
+            for parameter in (description or {}).get("Parameters", [])
+        ]
+
+        return merge_parameters(declared, parameters, previous)
+
+    def __expiry(self) -> Optional[float]:
+        """Returns the monotonic time the current wait must finish by, if it is limited"""
+        limits = []
+        if self.timeout is not None:
+            limits.append(time.monotonic() + self.timeout)
+        if self.deadline is not None:
+            limits.append(time.monotonic() + self.deadline - time.time())
+
+        return min(limits) if limits else None
+
+    def __remaining(self) -> float:
+        """Returns the number of seconds left before the current wait expires"""
+        if self.__expires is None:
+            return float("inf")
+
+        return max(0.0, self.__expires - time.monotonic())
+
+    def __check_expiry(self, stack_status: str):
+        """Once the current wait has expired, cancels the update (if enabled) and gives its rollback the grace
+        period to finish, or raises a StackTimeoutError"""
+        if self.__expires is None or time.monotonic() < self.__expires:
+            return
+
+        if (
+            self.__cancelled
+            or not self.cancel_on_timeout
+            or stack_status != "UPDATE_IN_PROGRESS"
+        ):
+            raise StackTimeoutError(
+                f"Timed out waiting for stack {self.name}, which is in {stack_status} status"
+            )
+
+        log(
+            f"Timed out waiting for stack {self.name}. Cancelling the update, and waiting up to"
+            f" {self.grace_period:.0f}s for it to roll back"
+        )
+        self.__acquire()
+        self.cloudformation.cancel_update_stack(
+            StackName=getattr(self, "id", self.name)
+        )
+        self.__invalidate()
+        self.__cancelled = True
+        self.__expires = time.monotonic() + self.grace_period
+
+    def __check_cancelled(self, stack_status: str) -> str:
+        """Raises a StackTimeoutError if the update was cancelled because the wait expired"""
+        if self.__cancelled:
+            raise StackTimeoutError(
+                f"Timed out waiting for stack {self.name}, which rolled back to {stack_status} status"
+            )
+
+        return stack_status
+
+    def __timed(self, step: str, function: Callable, *args):
+        """Calls the function, recording how long it took against the step in the stack's timings"""
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.timings[step] = time.perf_counter() - started
+
     def __describe(self) -> Dict:
         """Call CloudFormation DescribeStack"""
         described_name = getattr(self, "id", self.name)
 
+        if self.registry:
+            return self.registry.describe(described_name)
+
+        self.__acquire()
         stack_data = self.cloudformation.describe_stacks(StackName=described_name)
 
         return stack_data["Stacks"][0]  # type: ignore
+
+    def __emit(self, event: Dict):
+        """Records a stack event in the resource index and passes it on to each sink"""
+        stack_event = StackEvent(event)
+        self.resources.update(stack_event)
+        self.__dispatch("on_event", stack_event)
+
+    def __observe(self, stack_status: str) -> str:
+        """Tells the sinks the stack's status has been checked, and when it has changed. Returns the status"""
+        if stack_status != self.__status:
+            self.__status = stack_status
+            self.__dispatch("on_status_change", self.name, stack_status)
+        self.__dispatch("on_poll", self.name, stack_status)
+
+        return stack_status
+
+    def __dispatch(self, callback: str, *args):
+        """Delivers a callback to each sink"""
+        for sink in list(self.sinks):
+            sink.deliver(callback, *args)
+
+    def __flush_sinks(self):
+        """Waits for sinks that run on threads of their own to handle this wait's callbacks, within a time limit"""
+        for sink in list(self.sinks):
+            if not sink.flush(DEFAULT_FLUSH_TIMEOUT):
+                warning = f"Event sink {sink.name} did not finish handling stack events in time"
+                logger.warning(warning)
+
+    def __invalidate(self):
+        """Drops the stack from the shared describe cache (if any) after it has been changed"""
+        if self.registry:
+            self.registry.invalidate(self.name, getattr(self, "id", self.name))
+
+    def __acquire(self):
+        """Waits for the shared scheduler (if any) to allow another API call"""
+        if self.scheduler:
+            self.scheduler.acquire()
@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def event_time(event: Dict) -> float:
+    """Returns an event's timestamp in seconds, whether it came from the API or a notification"""
+    timestamp = event["Timestamp"]
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+    return timestamp.timestamp()
+
+
+class StackEvent:  # pylint: disable=too-many-instance-attributes
+    """A CloudFormation stack event, whether it was described through the API or pushed as a notification"""
+
+    __slots__ = (
+        "event_id",
+        "stack_id",
+        "stack_name",
+        "logical_resource_id",
+        "physical_resource_id",
+        "resource_type",
+        "resource_status",
+        "status_reason",
+        "timestamp",
+    )
+
+    event_id: str
+    stack_id: str
+    stack_name: str
+    logical_resource_id: str
+    physical_resource_id: Optional[str]
+    resource_type: Optional[str]
+    resource_status: str
+    status_reason: Optional[str]
+    timestamp: float
+
+    def __init__(self, event: Dict):
+        self.event_id = event["EventId"]
+        self.stack_id = event["StackId"]
+        self.stack_name = event["StackName"]
+        self.logical_resource_id = event["LogicalResourceId"]
+        self.physical_resource_id = event.get("PhysicalResourceId")
+        self.resource_type = event.get("ResourceType")
+        self.resource_status = event["ResourceStatus"]
+        self.status_reason = event.get("ResourceStatusReason")
+        self.timestamp = event_time(event)
+
+    def __repr__(self) -> str:
+        return f"StackEvent({self.logical_resource_id} - {self.resource_status})"
+
+    @property
+    def is_stack_event(self) -> bool:
+        """Whether the event is for the stack itself, rather than one of its resources"""
+        return self.physical_resource_id == self.stack_id
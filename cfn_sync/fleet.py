@@ -0,0 +1,110 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .cloudformation import (
+    IN_PROGRESS_STACK_STATUSES,
+    SUCCESSFUL_STACK_STATUSES,
+    CloudFormationClient,
+)
+
+FAILED_STACK_STATUSES = frozenset(
+    {
+        "CREATE_FAILED",
+        "ROLLBACK_FAILED",
+        "ROLLBACK_COMPLETE",
+        "DELETE_FAILED",
+        "UPDATE_FAILED",
+        "UPDATE_ROLLBACK_FAILED",
+        "UPDATE_ROLLBACK_COMPLETE",
+        "IMPORT_ROLLBACK_FAILED",
+        "IMPORT_ROLLBACK_COMPLETE",
+    }
+)
+
+# Every status a stack that still exists can be in
+EXISTING_STACK_STATUSES = (
+    IN_PROGRESS_STACK_STATUSES | SUCCESSFUL_STACK_STATUSES | FAILED_STACK_STATUSES
+) - {"DELETE_COMPLETE"}
+
+STATUS_GROUPS = {
+    "in-progress": IN_PROGRESS_STACK_STATUSES,
+    "failed": FAILED_STACK_STATUSES,
+    "complete": SUCCESSFUL_STACK_STATUSES - {"DELETE_COMPLETE"},
+}
+
+DEFAULT_CONCURRENCY = 4
+
+
+def expand_status_filter(status_filter: Iterable[str]) -> List[str]:
+    """Expands status group names (in-progress, failed, complete) into the stack statuses they hold"""
+    statuses: Set[str] = set()
+    for status in status_filter:
+        statuses |= STATUS_GROUPS.get(status, {status})
+
+    return sorted(statuses)
+
+
+def list_stacks(
+    cloudformation: CloudFormationClient,
+    prefix: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+) -> Iterator[Dict]:
+    """Yields a summary of each stack with one of the statuses and the name prefix, a page at a time"""
+    paginator = cloudformation.get_paginator("list_stacks")
+
+    for page in paginator.paginate(
+        StackStatusFilter=statuses or sorted(EXISTING_STACK_STATUSES)  # type: ignore
+    ):
+        for summary in page["StackSummaries"]:
+            if not prefix or summary["StackName"].startswith(prefix):
+                yield summary  # type: ignore
+
+
+def latest_failure_reason(
+    cloudformation: CloudFormationClient, stack_id: str
+) -> Optional[str]:
+    """Returns the reason given by the stack's most recent failed resource, from its first page of events"""
+    for event in cloudformation.describe_stack_events(StackName=stack_id)[
+        "StackEvents"
+    ]:
+        if event["ResourceStatus"].endswith("_FAILED") and event.get(
+            "ResourceStatusReason"
+        ):
+            return event["ResourceStatusReason"]
+
+    return None
+
+
+def with_failure_reasons(
+    cloudformation: CloudFormationClient,
+    summaries: Iterable[Dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Iterator[Tuple[Dict, Optional[str]]]:
+    """Pairs each stack summary with the latest failure reason of failed stacks, in order
+
+    At most `concurrency` failure reasons are fetched at once, and only a bounded window of summaries is held.
+    """
+    pending: Deque[Tuple[Dict, Optional[Future]]] = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for summary in summaries:
+            reason: Optional[Future] = None
+            if summary["StackStatus"] in FAILED_STACK_STATUSES:
+                reason = executor.submit(
+                    latest_failure_reason, cloudformation, summary["StackId"]
+                )
+            pending.append((summary, reason))
+
+            while len(pending) > concurrency * 2 or (
+                pending and (pending[0][1] is None or pending[0][1].done())
+            ):
+                yield _resolve(*pending.popleft())
+
+        while pending:
+            yield _resolve(*pending.popleft())
+
+
+def _resolve(summary: Dict, reason: Optional[Future]) -> Tuple[Dict, Optional[str]]:
+    """Waits for a summary's failure reason, if one is being fetched"""
+    return summary, reason.result() if reason else None
@@ -0,0 +1,203 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .cloudformation import IN_PROGRESS_STACK_STATUSES, CloudFormationClient
+
+DEFAULT_DATABASE = os.path.join(
+    os.path.expanduser("~"), ".cache", "cfn-sync", "history.sqlite"
+)
+
+DEPLOY_STARTING_STATUSES = frozenset(
+    {
+        "CREATE_IN_PROGRESS",
+        "UPDATE_IN_PROGRESS",
+        "DELETE_IN_PROGRESS",
+        "IMPORT_IN_PROGRESS",
+    }
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    stack_id TEXT NOT NULL,
+    stack_name TEXT NOT NULL,
+    logical_resource_id TEXT NOT NULL,
+    physical_resource_id TEXT,
+    resource_type TEXT,
+    resource_status TEXT NOT NULL,
+    status_reason TEXT,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_stack ON events (stack_name, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_resource ON events (stack_id, logical_resource_id, timestamp);
+CREATE INDEX IF NOT EXISTS events_by_status ON events (resource_status);
+CREATE TABLE IF NOT EXISTS stacks (
+    stack_name TEXT PRIMARY KEY,
+    stack_id TEXT NOT NULL,
+    last_event_id TEXT NOT NULL
+);
+"""
+
+RESOURCE_DURATIONS_QUERY = """
+SELECT resource_type, COUNT(*), AVG(duration), MAX(duration) FROM (
+    SELECT
+        resource_type,
+        resource_status,
+        physical_resource_id,
+        stack_id,
+        timestamp - LAG(timestamp) OVER resource AS duration,
+        LAG(resource_status) OVER resource AS previous_status
+    FROM events
+    WINDOW resource AS (PARTITION BY stack_id, logical_resource_id ORDER BY timestamp)
+)
+WHERE resource_status LIKE '%\\_COMPLETE' ESCAPE '\\'
+    AND previous_status LIKE '%\\_IN\\_PROGRESS' ESCAPE '\\'
+    AND physical_resource_id IS NOT stack_id
+GROUP BY resource_type
+ORDER BY AVG(duration) DESC
+LIMIT ?
+"""
+
+
+def _stack_filter(stack_names: Optional[Sequence[str]]) -> Tuple[str, List]:
+    """Builds a SQL condition limiting a query to the given stack names, if any"""
+    if not stack_names:
+        return "1 = 1", []
+
+    return f"stack_name IN ({', '.join('?' * len(stack_names))})", list(stack_names)
+
+
+class History:
+    """A local SQLite database of CloudFormation stack events, synchronised incrementally"""
+
+    path: str
+
+    def __init__(self, path: str = DEFAULT_DATABASE):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "History":
+        return self
+
+    def __exit__(self, *_):
+        self.connection.close()
+
+    def sync(self, cloudformation: CloudFormationClient, stack_name: str) -> int:
+        """Stores the stack's events that are newer than the last sync. Returns how many were stored"""
+        last_sync = self.connection.execute(
+            "SELECT last_event_id FROM stacks WHERE stack_name = ?", (stack_name,)
+        ).fetchone()
+        last_event_id = last_sync[0] if last_sync else None
+
+        rows = []
+        for event in self.__events_since(cloudformation, stack_name, last_event_id):
+            rows.append(
+                (
+                    event["EventId"],
+                    event["StackId"],
+                    event["StackName"],
+                    event["LogicalResourceId"],
+                    event.get("PhysicalResourceId"),
+                    event.get("ResourceType"),
+                    event["ResourceStatus"],
+                    event.get("ResourceStatusReason"),
+                    event["Timestamp"].timestamp(),
+                )
+            )
+
+        if rows:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO stacks VALUES (?, ?, ?)",
+                    (stack_name, rows[0][1], rows[0][0]),
+                )
+
+        return len(rows)
+
+    @staticmethod
+    def __events_since(
+        cloudformation: CloudFormationClient,
+        stack_name: str,
+        last_event_id: Optional[str],
+    ) -> Iterator[Dict]:
+        """Yields the stack's events newest first, following pages only back to the last stored event"""
+        paginator = cloudformation.get_paginator("describe_stack_events")
+
+        for page in paginator.paginate(StackName=stack_name):
+            for event in page["StackEvents"]:
+                if event["EventId"] == last_event_id:
+                    return
+
+                yield event  # type: ignore
+
+    def deploys(self, stack_names: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+        """Yields each stack operation, from its stack-level start event to its final status, in the order they
+        started across every stack"""
+        condition, parameters = _stack_filter(stack_names)
+        cursor = self.connection.execute(
+            "SELECT stack_id, stack_name, resource_status, timestamp FROM events"
+            f" WHERE physical_resource_id = stack_id AND {condition}"
+            " ORDER BY timestamp, stack_id",
+            parameters,
+        )
+
+        started: Dict[str, Tuple[str, float]] = {}
+        runs: List[Dict] = []
+        for stack_id, stack_name, resource_status, timestamp in cursor:
+            if resource_status in DEPLOY_STARTING_STATUSES and stack_id not in started:
+                started[stack_id] = (resource_status, timestamp)
+            elif (
+                resource_status not in IN_PROGRESS_STACK_STATUSES
+                and stack_id in started
+            ):
+                operation, start = started.pop(stack_id)
+                runs.append(
+                    {
+                        "stack_name": stack_name,
+                        "operation": operation.split("_", 1)[0],
+                        "started": datetime.fromtimestamp(start, timezone.utc),
+                        "duration": timestamp - start,
+                        "status": resource_status,
+                    }
+                )
+
+        # Operations finish in a different order to the one they started in when they overlap
+        yield from sorted(runs, key=lambda run: run["started"])
+
+    def slowest_resource_types(self, limit: int = 10) -> List[Dict]:
+        """Returns the resource types that take the longest to stabilise on average"""
+        return [
+            {
+                "resource_type": resource_type,
+                "count": count,
+                "average_duration": average,
+                "max_duration": maximum,
+            }
+            for resource_type, count, average, maximum in self.connection.execute(
+                RESOURCE_DURATIONS_QUERY, (limit,)
+            )
+        ]
+
+    def failure_reasons(
+        self, stack_names: Optional[Sequence[str]] = None, limit: int = 10
+    ) -> List[Dict]:
+        """Returns the most common reasons given for resources failing"""
+        condition, parameters = _stack_filter(stack_names)
+        cursor = self.connection.execute(
+            "SELECT status_reason, COUNT(*) FROM events"
+            " WHERE resource_status LIKE '%FAILED' AND status_reason IS NOT NULL"
+            f" AND {condition} GROUP BY status_reason ORDER BY COUNT(*) DESC LIMIT ?",
+            parameters + [limit],
+        )
+
+        return [{"reason": reason, "count": count} for reason, count in cursor]
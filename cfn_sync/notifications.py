@@ -0,0 +1,147 @@
+import json
+import logging
+import queue
+import re
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from botocore.exceptions import ClientError  # type: ignore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from mypy_boto3_sqs.client import SQSClient
+else:
+    SQSClient = object
+
+DEFAULT_WAIT_TIME_SECONDS = 20
+DEFAULT_CONSISTENCY_CHECK_INTERVAL = 60
+DEFAULT_MAX_RECEIVES = 3
+
+NOTIFICATION_FIELD = re.compile(r"^(\w+)='(.*?)'$", re.MULTILINE | re.DOTALL)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def parse_notification(body: str) -> Dict:
+    """Parses a CloudFormation stack event notification, delivered raw or inside an SNS envelope, into an event"""
+    try:
+        message = json.loads(body)["Message"]
+    except (ValueError, KeyError, TypeError):
+        message = body
+
+    event = {
+        key: value
+        for key, value in NOTIFICATION_FIELD.findall(message)
+        if value not in ("", "null")
+    }
+
+    if "EventId" not in event or "ResourceStatus" not in event:
+        raise ValueError("Message is not a CloudFormation stack event notification")
+
+    return event
+
+
+class NotificationListener:  # pylint: disable=too-many-instance-attributes
+    """Long-polls an SQS queue subscribed to stack notifications, handing each stack's events to whoever waits on it"""
+
+    queue_url: str
+    wait_time_seconds: int
+    consistency_check_interval: int
+    max_receives: int = DEFAULT_MAX_RECEIVES
+
+    def __init__(
+        self,
+        sqs: SQSClient,
+        queue_url: str,
+        wait_time_seconds: int = DEFAULT_WAIT_TIME_SECONDS,
+        consistency_check_interval: int = DEFAULT_CONSISTENCY_CHECK_INTERVAL,
+    ):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.wait_time_seconds = wait_time_seconds
+        self.consistency_check_interval = consistency_check_interval
+        self.__queues: Dict[str, queue.Queue] = {}
+        self.__lock = threading.Lock()
+        self.__thread: Optional[threading.Thread] = None
+        self.__stopped = threading.Event()
+
+    def register(self, *stack_identifiers: str) -> queue.Queue:
+        """Returns a queue that receives the events of the stack with any of the given names/IDs"""
+        events: queue.Queue = queue.Queue()
+        with self.__lock:
+            for stack_identifier in stack_identifiers:
+                self.__queues[stack_identifier] = events
+
+        return events
+
+    def unregister(self, *stack_identifiers: str):
+        """Stops handing out events for the stack with the given names/IDs"""
+        with self.__lock:
+            for stack_identifier in stack_identifiers:
+                self.__queues.pop(stack_identifier, None)
+
+    def start(self):
+        """Starts long-polling the queue on a background thread"""
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+
+    def stop(self):
+        """Stops long-polling the queue once the current poll completes"""
+        self.__stopped.set()
+
+    def poll(self) -> int:
+        """Receives one batch of messages, dispatching the events of registered stacks. Returns how many were dispatched
+
+        Events for stacks nobody is waiting on are left on the queue for other consumers, until they have been
+        received `max_receives` times. They are then deleted, so events nobody will claim (e.g. those that arrive
+        after a wait finishes) don't keep coming back and crowd out new ones.
+        """
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=self.wait_time_seconds,
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+
+        handled: List[Dict] = []
+        unclaimed: List[Dict] = []
+        for message in response.get("Messages", []):
+            try:
+                event = parse_notification(message["Body"])
+            except ValueError:
+                continue
+
+            with self.__lock:
+                events = self.__queues.get(
+                    event.get("StackId", ""),
+                    self.__queues.get(event.get("StackName", "")),
+                )
+
+            entry = {
+                "Id": message["MessageId"],
+                "ReceiptHandle": message["ReceiptHandle"],
+            }
+            if events is not None:
+                events.put(event)
+                handled.append(entry)
+            elif (
+                int(message.get("Attributes", {}).get("ApproximateReceiveCount", 1))
+                >= self.max_receives
+            ):
+                unclaimed.append(entry)
+
+        if handled or unclaimed:
+            self.sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=handled + unclaimed)  # type: ignore
+
+        return len(handled)
+
+    def __run(self):
+        """Polls the queue until stopped"""
+        while not self.__stopped.is_set():
+            try:
+                self.poll()
+            except ClientError as exception:
+                warning = f"Unable to receive stack notifications: {exception}"
+                logger.warning(warning)
+                self.__stopped.wait(self.wait_time_seconds)
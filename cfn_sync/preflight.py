@@ -0,0 +1,228 @@
+import re
+from typing import Dict, Iterator, List, Set, Tuple
+
+from .template import TemplateError, duplicate_keys, parse_template
+
+MAX_TEMPLATE_BODY_BYTES = 51200
+MAX_RESOURCES = 500
+MAX_PARAMETERS = 200
+MAX_OUTPUTS = 200
+
+PSEUDO_PARAMETERS = frozenset(
+    {
+        "AWS::AccountId",
+        "AWS::NotificationARNs",
+        "AWS::NoValue",
+        "AWS::Partition",
+        "AWS::Region",
+        "AWS::StackId",
+        "AWS::StackName",
+        "AWS::URLSuffix",
+    }
+)
+
+SUB_VARIABLE = re.compile(r"\$\{([^}]*)\}")
+
+
+class PreflightError(TemplateError):
+    """Raised when a template breaks CloudFormation's rules in ways that can be seen without calling AWS"""
+
+    violations: List[str]
+
+    def __init__(self, violations: List[str]):
+        super().__init__(
+            "Template failed preflight checks:\n"
+            + "\n".join(f"  - {violation}" for violation in violations)
+        )
+        self.violations = violations
+
+
+def check_template(template_body: str) -> List[str]:
+    """Checks a template against CloudFormation's limits and rules, returning every violation found
+
+    The template is parsed once and each check is linear in its size.
+    """
+    violations = []
+
+    size = len(template_body.encode("utf-8"))
+    if size > MAX_TEMPLATE_BODY_BYTES:
+        violations.append(
+            f"Template body is {size} bytes, over the limit of {MAX_TEMPLATE_BODY_BYTES}"
+        )
+
+    try:
+        template = parse_template(template_body)
+    except TemplateError as exception:
+        return violations + [str(exception)]
+
+    violations += [f"Duplicate key: {key}" for key in duplicate_keys(template_body)]
+
+    resources = template.get("Resources")
+    if not isinstance(resources, dict) or not resources:
+        return violations + ["Template has no Resources"]
+
+    for section, limit in (
+        ("Resources", MAX_RESOURCES),
+        ("Parameters", MAX_PARAMETERS),
+        ("Outputs", MAX_OUTPUTS),
+    ):
+        count = len(template.get(section) or {})
+        if count > limit:
+            violations.append(
+                f"Template has {count} {section}, over the limit of {limit}"
+            )
+
+    # Resources created by transforms (e.g. SAM) can't be known without expanding the template
+    if "Transform" not in template:
+        violations += _check_references(template, resources)
+
+    return violations
+
+
+def preflight(template_body: str):
+    """Raises a PreflightError listing every violation found in the template, if any"""
+    violations = check_template(template_body)
+    if violations:
+        raise PreflightError(violations)
+
+
+def _check_references(template: Dict, resources: Dict) -> List[str]:
+    """Checks that Ref, GetAtt, Sub and DependsOn targets exist, and that resources don't depend on each other
+    in a cycle"""
+    violations = []
+    refable = set(resources) | set(template.get("Parameters") or {}) | PSEUDO_PARAMETERS
+    dependencies: Dict[str, Set[str]] = {}
+
+    for logical_id, resource in resources.items():
+        dependencies[logical_id] = set()
+        if not isinstance(resource, dict):
+            violations.append(f"Resource {logical_id} is not a mapping")
+            continue
+
+        depends_on = resource.get("DependsOn", [])
+        for target in [depends_on] if isinstance(depends_on, str) else depends_on:
+            if isinstance(target, str) and target in resources:
+                dependencies[logical_id].add(target)
+            else:
+                violations.append(
+                    f"Resource {logical_id} DependsOn {target}, which is not a resource"
+                )
+
+        for function, target in _references(resource):
+            if target in resources:
+                dependencies[logical_id].add(target)
+            elif function == "Ref" and target not in refable:
+                violations.append(
+                    f"Resource {logical_id} refers to {target}, which is not a parameter or resource"
+                )
+            elif function == "Fn::GetAtt":
+                violations.append(
+                    f"Resource {logical_id} gets an attribute of {target}, which is not a resource"
+                )
+
+    for section in ("Conditions", "Outputs"):
+        for function, target in _references(template.get(section) or {}):
+            if target not in (refable if function == "Ref" else resources):
+                violations.append(
+                    f"{section} section refers to {target}, which is not defined"
+                )
+
+    return violations + [
+        f"Circular dependency between resources: {' -> '.join(cycle)}"
+        for cycle in _find_cycles(dependencies)
+    ]
+
+
+def _references(value) -> Iterator[Tuple[str, str]]:
+    """Yields the (function, target) of every Ref and GetAtt in a template fragment, including those implied by
+    Fn::Sub, walking it iteratively so deeply nested templates don't exhaust the stack
+    """
+    stack = [value]
+
+    while stack:
+        value = stack.pop()
+
+        if isinstance(value, list):
+            stack.extend(value)
+            continue
+
+        if not isinstance(value, dict):
+            continue
+
+        if len(value) == 1:
+            ((function, argument),) = value.items()
+            if function == "Ref" and isinstance(argument, str):
+                yield "Ref", argument
+                continue
+            if function == "Fn::GetAtt":
+                if isinstance(argument, str):
+                    argument = argument.split(".", 1)
+                if (
+                    isinstance(argument, list)
+                    and argument
+                    and isinstance(argument[0], str)
+                ):
+                    yield "Fn::GetAtt", argument[0]
+                    continue
+            if function == "Fn::Sub":
+                yield from _sub_references(argument)
+                if isinstance(argument, list) and len(argument) > 1:
+                    stack.append(argument[1])
+                continue
+
+        stack.extend(value.values())
+
+
+def _sub_references(argument) -> Iterator[Tuple[str, str]]:
+    """Yields the references made by the variables of a Fn::Sub string, other than its own variables"""
+    if isinstance(argument, list) and argument:
+        string = argument[0]
+        local = (
+            set(argument[1])
+            if len(argument) > 1 and isinstance(argument[1], dict)
+            else set()
+        )
+    else:
+        string, local = argument, set()
+
+    if not isinstance(string, str):
+        return
+
+    for variable in SUB_VARIABLE.findall(string):
+        variable = variable.strip()
+        if variable.startswith("!") or variable in local:
+            continue
+        if "." in variable and not variable.startswith("AWS::"):
+            yield "Fn::GetAtt", variable.split(".", 1)[0]
+        else:
+            yield "Ref", variable
+
+
+def _find_cycles(dependencies: Dict[str, Set[str]]) -> List[List[str]]:
+    """Finds cycles in the resource dependency graph with an iterative depth-first search"""
+    cycles = []
+    done: Set[str] = set()
+
+    for root in dependencies:
+        if root in done:
+            continue
+
+        path = [root]
+        on_path = {root}
+        iterators = [iter(sorted(dependencies[root]))]
+
+        while iterators:
+            dependency = next(iterators[-1], None)
+
+            if dependency is None:
+                iterators.pop()
+                done.add(path[-1])
+                on_path.discard(path.pop())
+            elif dependency in on_path:
+                cycles.append(path[path.index(dependency) :] + [dependency])
+            elif dependency not in done:
+                path.append(dependency)
+                on_path.add(dependency)
+                iterators.append(iter(sorted(dependencies[dependency])))
+
+    return cycles
@@ -0,0 +1,244 @@
+import heapq
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .cloudformation import SUCCESSFUL_STACK_STATUSES, log
+from .events import StackEvent
+from .sinks import EventSink
+
+DEFAULT_DURATIONS_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "cfn-sync", "durations.json"
+)
+
+# A resource is flagged once it has been running this many times longer than usual
+SLOW_FACTOR = 2.0
+
+# The least time between progress lines logged while polling without new events
+PROGRESS_INTERVAL = 30.0
+
+
+def format_duration(seconds: float) -> str:
+    """Formats a number of seconds as minutes and seconds"""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class DurationModel:
+    """Running averages of how long resources, resource types and whole stacks take to stabilise"""
+
+    path: str
+
+    def __init__(self, path: str = DEFAULT_DURATIONS_FILE):
+        self.path = path
+        self.resource_types: Dict[str, List[float]] = {}
+        self.resources: Dict[str, List[float]] = {}
+        self.stacks: Dict[str, List[float]] = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as durations_file:
+                    durations = json.load(durations_file)
+
+                self.resource_types = durations.get("resource_types", {})
+                self.resources = durations.get("resources", {})
+                self.stacks = durations.get("stacks", {})
+            except (OSError, ValueError, AttributeError) as exception:
+                log(f"Ignoring unreadable durations file {path}: {exception}")
+
+    def save(self):
+        """Writes the model back to its file, replacing it atomically so concurrent runs never see it half-written"""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False
+        ) as durations_file:
+            json.dump(
+                {
+                    "resource_types": self.resource_types,
+                    "resources": self.resources,
+                    "stacks": self.stacks,
+                },
+                durations_file,
+            )
+
+        try:
+            os.replace(durations_file.name, self.path)
+        except OSError:
+            os.unlink(durations_file.name)
+            raise
+
+    def expected(
+        self, stack_name: str, logical_resource_id: str, resource_type: Optional[str]
+    ) -> Optional[float]:
+        """Returns how long a resource usually takes, preferring its own history over its type's"""
+        observed = self.resources.get(f"{stack_name}/{logical_resource_id}")
+        if observed is None and resource_type:
+            observed = self.resource_types.get(resource_type)
+
+        return observed[1] if observed else None
+
+    def expected_stack(self, stack_name: str) -> Optional[Tuple[float, int]]:
+        """Returns how long a stack operation usually takes, and how many resources it usually changes"""
+        observed = self.stacks.get(stack_name)
+
+        return (observed[1], int(observed[2])) if observed else None
+
+    def observe(
+        self,
+        stack_name: str,
+        logical_resource_id: str,
+        resource_type: Optional[str],
+        duration: float,
+    ):
+        """Adds a resource's observed duration to the averages"""
+        _add_observation(
+            self.resources, f"{stack_name}/{logical_resource_id}", duration
+        )
+        if resource_type:
+            _add_observation(self.resource_types, resource_type, duration)
+
+    def observe_stack(self, stack_name: str, duration: float, resource_count: int):
+        """Adds a stack operation's observed duration to the averages, along with how many resources it changed"""
+        _add_observation(self.stacks, stack_name, duration)
+        self.stacks[stack_name][2:] = [resource_count]
+
+
+def _add_observation(averages: Dict[str, List[float]], key: str, duration: float):
+    """Folds an observation into a [count, mean] running average"""
+    count, mean = averages.get(key, [0, 0.0])[:2]
+    averages[key] = [count + 1, mean + (duration - mean) / (count + 1)]
+
+
+class ProgressTracker(EventSink):  # pylint: disable=too-many-instance-attributes
+    """Event sink that logs percent complete, time remaining and unusually slow resources, and learns how long
+    resources take from successful operations"""
+
+    stack_name: str
+
+    def __init__(self, model: DurationModel, stack_name: str):
+        self.model = model
+        self.stack_name = stack_name
+        self.expected_stack = model.expected_stack(stack_name)
+        self.started_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        self.__running: Dict[str, Tuple[Optional[str], float]] = {}
+        self.__deadlines: List[Tuple[float, str, float, float]] = []
+        self.__observations: List[Tuple[str, Optional[str], float]] = []
+        self.__completed = 0
+        self.__logged_at: Optional[float] = None
+
+    def on_event(self, event: StackEvent):
+        """Updates progress from a stack event"""
+        timestamp = event.timestamp
+        logical_resource_id = event.logical_resource_id
+        resource_status = event.resource_status
+        self.updated_at = timestamp
+        self.__flag_slow(timestamp)
+
+        if event.is_stack_event:
+            if self.started_at is None and resource_status.endswith("_IN_PROGRESS"):
+                self.started_at = timestamp
+            return
+
+        if resource_status.endswith("_IN_PROGRESS"):
+            self.__start(logical_resource_id, event.resource_type, timestamp)
+        elif logical_resource_id in self.__running:
+            resource_type, started = self.__running.pop(logical_resource_id)
+            self.__completed += 1
+            if resource_status.endswith("_COMPLETE"):
+                self.__observations.append(
+                    (logical_resource_id, resource_type, timestamp - started)
+                )
+            self.__log_progress(timestamp)
+
+    def on_poll(self, stack_name: str, stack_status: str):
+        """Flags resources that have become slow, and refreshes the estimate of the time remaining, even when no
+        new events have arrived"""
+        now = time.time()
+        self.__flag_slow(now)
+
+        if (
+            self.expected_stack
+            and self.started_at is not None
+            and (
+                self.__logged_at is None or now - self.__logged_at >= PROGRESS_INTERVAL
+            )
+        ):
+            self.__log_progress(now)
+
+    def on_finish(self, stack_name: str, stack_status: str):
+        """Records the durations observed once the stack has stabilised"""
+        self.finish(stack_status in SUCCESSFUL_STACK_STATUSES)
+
+    def finish(self, successful: bool):
+        """Records the durations observed during a successful operation in the model"""
+        if not successful:
+            return
+
+        for logical_resource_id, resource_type, duration in self.__observations:
+            self.model.observe(
+                self.stack_name, logical_resource_id, resource_type, duration
+            )
+
+        if self.started_at is not None and self.updated_at is not None:
+            self.model.observe_stack(
+                self.stack_name, self.updated_at - self.started_at, self.__completed
+            )
+
+        self.model.save()
+
+    def __start(
+        self, logical_resource_id: str, resource_type: Optional[str], timestamp: float
+    ):
+        """Records a resource starting, and when it would be unusually slow"""
+        if logical_resource_id in self.__running:
+            return
+
+        self.__running[logical_resource_id] = (resource_type, timestamp)
+        expected = self.model.expected(
+            self.stack_name, logical_resource_id, resource_type
+        )
+        if expected:
+            heapq.heappush(
+                self.__deadlines,
+                (
+                    timestamp + expected * SLOW_FACTOR,
+                    logical_resource_id,
+                    timestamp,
+                    expected,
+                ),
+            )
+
+    def __flag_slow(self, timestamp: float):
+        """Logs resources that are still running past their slow deadline"""
+        while self.__deadlines and self.__deadlines[0][0] < timestamp:
+            _, logical_resource_id, started, expected = heapq.heappop(self.__deadlines)
+            if self.__running.get(logical_resource_id, (None, None))[1] == started:
+                running_for = timestamp - started
+                log(
+                    f"{logical_resource_id} has been running for {format_duration(running_for)},"
+                    f" it usually takes {format_duration(expected)}"
+                )
+
+    def __log_progress(self, timestamp: float):
+        """Logs the percent complete and estimated time remaining, where the model allows"""
+        self.__logged_at = timestamp
+        if not self.expected_stack:
+            log(f"Progress: {self.__completed} resources complete")
+            return
+
+        expected_duration, expected_resources = self.expected_stack
+        percent = min(99, 100 * self.__completed // max(expected_resources, 1))
+        message = (
+            f"Progress: {percent}% ({self.__completed}/{expected_resources} resources)"
+        )
+
+        if self.started_at is not None:
+            remaining = expected_duration - (timestamp - self.started_at)
+            message += f", about {format_duration(max(remaining, 0))} remaining"
+
+        log(message)
@@ -0,0 +1,156 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple
+
+from .scheduler import Scheduler
+
+if TYPE_CHECKING:  # pragma: no cover
+    from mypy_boto3_cloudformation.client import CloudFormationClient
+else:
+    CloudFormationClient = object
+
+DEFAULT_TTL = 4.0
+DEFAULT_BULK_THRESHOLD = 3
+
+
+class StackRegistry:  # pylint: disable=too-many-instance-attributes
+    """Serves DescribeStacks results to many Stack objects from a shared, short-lived cache
+
+    When several waiting stacks need a fresh status at once, one paginated DescribeStacks of the whole account
+    refreshes all of them. Entries expire after the TTL, and are invalidated whenever a stack is created, updated
+    or deleted, so a status read after a mutating call is always fetched from CloudFormation.
+
+    The lock only guards the cache: API calls are made outside it, and callers that need a bulk refresh while one
+    is in flight wait for it rather than starting another.
+    """
+
+    ttl: float
+    bulk_threshold: int
+
+    def __init__(
+        self,
+        cloudformation: CloudFormationClient,
+        ttl: float = DEFAULT_TTL,
+        bulk_threshold: int = DEFAULT_BULK_THRESHOLD,
+        scheduler: Optional[Scheduler] = None,
+    ):
+        self.cloudformation = cloudformation
+        self.ttl = ttl
+        self.bulk_threshold = bulk_threshold
+        self.scheduler = scheduler
+        self.__cache: Dict[str, Tuple[float, Dict]] = {}
+        self.__waiting: Set[str] = set()
+        self.__bulk_pages = 1
+        self.__refreshing: Optional[threading.Event] = None
+        # The generation each stack was last invalidated in, so descriptions fetched before then aren't cached
+        self.__generation = 0
+        self.__invalidated: Dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def track(self, stack_identifier: str):
+        """Marks a stack as waiting, so it is included when deciding whether to refresh in bulk"""
+        with self.__lock:
+            self.__waiting.add(stack_identifier)
+
+    def untrack(self, stack_identifier: str):
+        """Marks a stack as no longer waiting"""
+        with self.__lock:
+            self.__waiting.discard(stack_identifier)
+
+    def invalidate(self, *stack_identifiers: str):
+        """Drops the cached descriptions of a stack, e.g. after a create/update/delete"""
+        with self.__lock:
+            self.__generation += 1
+            for stack_identifier in stack_identifiers:
+                self.__cache.pop(stack_identifier, None)
+                self.__invalidated[stack_identifier] = self.__generation
+
+    def describe(self, stack_identifier: str) -> Dict:
+        """Returns the stack's description, from the cache if it is fresh
+
+        Raises the DescribeStacks ClientError when the stack does not exist.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            cached = self.__fresh(stack_identifier, now)
+            if cached:
+                return cached
+
+            generation = self.__generation
+            refreshing = self.__refreshing
+            refresh = refreshing is None and self.__needs_bulk_refresh(now)
+            if refresh:
+                self.__refreshing = threading.Event()
+
+        if refresh:
+            self.__refresh_all(now, generation)
+        elif refreshing:
+            refreshing.wait()
+
+        if refresh or refreshing:
+            with self.__lock:
+                cached = self.__fresh(stack_identifier, now)
+            if cached:
+                return cached
+
+        # Deleted stacks are missing from a bulk refresh, and are only returned when described by ID
+        if self.scheduler:
+            self.scheduler.acquire()
+        stack: Dict = self.cloudformation.describe_stacks(  # type: ignore
+            StackName=stack_identifier
+        )["Stacks"][0]
+        with self.__lock:
+            self.__store(stack, now, generation)
+
+        return stack
+
+    def __needs_bulk_refresh(self, now: float) -> bool:
+        """Returns whether enough waiting stacks are stale to be worth describing every stack in the account"""
+        stale = sum(1 for waiting in self.__waiting if not self.__fresh(waiting, now))
+        return stale >= max(self.bulk_threshold, self.__bulk_pages + 1)
+
+    def __fresh(self, stack_identifier: str, now: float) -> Optional[Dict]:
+        """Returns the cached description of the stack, if it has not expired"""
+        cached = self.__cache.get(stack_identifier)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+
+        return None
+
+    def __refresh_all(self, now: float, generation: int):
+        """Describes every stack in the account, one page at a time, then releases the callers waiting on it"""
+        pages = 0
+        request: Dict = {}
+
+        try:
+            while True:
+                if self.scheduler:
+                    self.scheduler.acquire()
+                page: Dict = self.cloudformation.describe_stacks(**request)  # type: ignore
+                pages += 1
+                with self.__lock:
+                    for stack in page["Stacks"]:
+                        self.__store(stack, now, generation)
+
+                if not page.get("NextToken"):
+                    break
+                request["NextToken"] = page["NextToken"]
+
+            self.__bulk_pages = pages
+        finally:
+            with self.__lock:
+                refreshing, self.__refreshing = self.__refreshing, None
+            if refreshing:
+                refreshing.set()
+
+    def __store(self, stack: Dict, now: float, generation: int):
+        """Caches a description under both the stack's name and ID, unless the stack has been invalidated since the
+        description was requested in the given generation"""
+        if (
+            self.__invalidated.get(stack["StackName"], 0) > generation
+            or self.__invalidated.get(stack["StackId"], 0) > generation
+        ):
+            return
+
+        self.__cache[stack["StackName"]] = (now, stack)
+        self.__cache[stack["StackId"]] = (now, stack)
@@ -0,0 +1,104 @@
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from .events import StackEvent
+
+
+class ResourceState:
+    """The current state of one resource in a stack"""
+
+    __slots__ = ("resource_type", "status", "started", "reason")
+
+    resource_type: Optional[str]
+    status: str
+    started: float
+    reason: Optional[str]
+
+    def __init__(
+        self,
+        resource_type: Optional[str],
+        status: str,
+        started: float,
+        reason: Optional[str] = None,
+    ):
+        self.resource_type = resource_type
+        self.status = status
+        self.started = started
+        self.reason = reason
+
+
+class ResourceIndex:
+    """Index of the current state of each resource in a stack, built from its events
+
+    Counts per status and the resources in progress are maintained as events arrive, so summarising even a very
+    large stack doesn't need to look at every resource.
+    """
+
+    def __init__(self) -> None:
+        self.__resources: Dict[str, ResourceState] = {}
+        self.__counts: Counter = Counter()
+        # Resources in progress, in the order they started
+        self.__in_progress: Dict[str, None] = {}
+
+    def __len__(self) -> int:
+        return len(self.__resources)
+
+    def __contains__(self, logical_resource_id: str) -> bool:
+        return logical_resource_id in self.__resources
+
+    def __getitem__(self, logical_resource_id: str) -> ResourceState:
+        return self.__resources[logical_resource_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__resources)
+
+    def clear(self):
+        """Forgets every resource"""
+        self.__resources.clear()
+        self.__counts.clear()
+        self.__in_progress.clear()
+
+    def update(self, event: StackEvent) -> Optional[ResourceState]:
+        """Updates the index from a stack event. Returns the resource's new state, or None for the stack's own
+        events"""
+        if event.is_stack_event:
+            return None
+
+        logical_resource_id = event.logical_resource_id
+        status = event.resource_status
+        state = self.__resources.get(logical_resource_id)
+
+        if state is None:
+            state = ResourceState(event.resource_type, status, event.timestamp)
+            self.__resources[logical_resource_id] = state
+        else:
+            self.__counts[state.status] -= 1
+            if state.status != status:
+                self.__in_progress.pop(logical_resource_id, None)
+                if status.endswith("_IN_PROGRESS"):
+                    state.started = event.timestamp
+            state.status = status
+
+        state.reason = event.status_reason
+        self.__counts[status] += 1
+        if status.endswith("_IN_PROGRESS"):
+            self.__in_progress.setdefault(logical_resource_id, None)
+
+        return state
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of resources in each status"""
+        return {status: count for status, count in self.__counts.items() if count}
+
+    def in_progress(self, limit: Optional[int] = None) -> List[str]:
+        """Returns the logical IDs of (up to `limit` of) the resources in progress, longest running first"""
+        return list(islice(self.__in_progress, limit))
+
+    def failed(self) -> List[str]:
+        """Returns the logical IDs of the resources whose latest status is a failure"""
+        return [
+            logical_resource_id
+            for logical_resource_id, state in self.__resources.items()
+            if state.status.endswith("_FAILED")
+        ]
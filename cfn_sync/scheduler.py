@@ -0,0 +1,42 @@
+import threading
+import time
+
+DEFAULT_CALLS_PER_SECOND = 4.0
+DEFAULT_BURST = 8
+
+
+class Scheduler:
+    """Shares a global CloudFormation API call budget between every stack that is waiting at once"""
+
+    calls_per_second: float
+    burst: int
+
+    def __init__(
+        self,
+        calls_per_second: float = DEFAULT_CALLS_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+    ):
+        self.calls_per_second = calls_per_second
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until the budget allows another API call to be made"""
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(
+                    float(self.burst),
+                    self.__tokens + (now - self.__updated) * self.calls_per_second,
+                )
+                self.__updated = now
+
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+
+                delay = (1 - self.__tokens) / self.calls_per_second
+
+            time.sleep(delay)
@@ -0,0 +1,323 @@
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import stat
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+from botocore.exceptions import ClientError  # type: ignore
+
+from .cloudformation import (
+    DEFAULT_GRACE_PERIOD,
+    DEFAULT_WAIT_DELAY,
+    SUCCESSFUL_STACK_STATUSES,
+    CloudFormationClient,
+    Stack,
+    StackTimeoutError,
+    log_event,
+)
+from .registry import StackRegistry
+from .scheduler import Scheduler
+from .sinks import CallbackSink
+from .template import ParameterError, TemplateError
+
+JOB_ACTIONS = frozenset({"deploy", "delete", "watch"})
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Parses a HOST:PORT address into a TCP address, or anything else into a Unix socket path"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+
+    return address
+
+
+class Job:
+    """A running operation against a stack, with its events fanned out to every subscriber"""
+
+    action: str
+    stack_name: str
+    result: Optional[Dict] = None
+
+    def __init__(self, action: str, stack_name: str):
+        self.action = action
+        self.stack_name = stack_name
+        self.__history: List[Dict] = []
+        self.__subscribers: List[queue.Queue] = []
+        self.__lock = threading.Lock()
+
+    def publish(self, message: Dict):
+        """Sends a message to every current subscriber, and keeps it for late subscribers"""
+        with self.__lock:
+            self.__history.append(message)
+            for subscriber in self.__subscribers:
+                subscriber.put(message)
+
+    def subscribe(self) -> queue.Queue:
+        """Returns a queue that replays the job's messages so far, then follows it until it finishes with None"""
+        subscriber: queue.Queue = queue.Queue()
+        with self.__lock:
+            for message in self.__history:
+                subscriber.put(message)
+
+            if self.result is None:
+                self.__subscribers.append(subscriber)
+            else:
+                subscriber.put(None)
+
+        return subscriber
+
+    def finish(self, result: Dict):
+        """Records the job's result and releases every subscriber"""
+        with self.__lock:
+            self.result = result
+            for subscriber in self.__subscribers:
+                subscriber.put(None)
+            self.__subscribers.clear()
+
+
+class JobServer:
+    """Runs deploy/delete/watch jobs on a shared client, scheduler and describe cache, deduplicating watchers of the
+    same stack"""
+
+    def __init__(
+        self,
+        cloudformation: CloudFormationClient,
+        scheduler: Scheduler,
+        wait_delay: int = DEFAULT_WAIT_DELAY,
+    ):
+        self.cloudformation = cloudformation
+        self.scheduler = scheduler
+        self.wait_delay = wait_delay
+        self.registry = StackRegistry(cloudformation, scheduler=scheduler)
+        self.__jobs: Dict[str, Job] = {}
+        self.__lock = threading.Lock()
+
+    def submit(self, request: Dict) -> Job:
+        """Starts a job for the request, or joins the running job when watching a stack that already has one"""
+        action = request.get("action")
+        stack_name = request.get("stack_name")
+
+        if action not in JOB_ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        if not stack_name:
+            raise ValueError("A stack_name is required")
+
+        with self.__lock:
+            running = self.__jobs.get(stack_name)
+            if running:
+                if action == "watch":
+                    return running
+
+                raise ValueError(
+                    f"Stack {stack_name} already has a running {running.action} job"
+                )
+
+            job = Job(action, stack_name)
+            self.__jobs[stack_name] = job
+
+        threading.Thread(target=self.__run, args=(job, request), daemon=True).start()
+
+        return job
+
+    def __run(self, job: Job, request: Dict):
+        """Performs the job, publishing each stack event to its subscribers"""
+        stack = Stack(
+            self.cloudformation,
+            job.stack_name,
+            self.wait_delay,
+            self.scheduler,
+            self.registry,
+        )
+        stack.add_sink(
+            CallbackSink(
+                lambda event: job.publish(
+                    {
+                        "event": {
+                            "logical_resource_id": event.logical_resource_id,
+                            "resource_status": event.resource_status,
+                            "status_reason": event.status_reason,
+                        }
+                    }
+                )
+            )
+        )
+
+        stack.set_timeout(
+            request.get("timeout"),
+            request.get("deadline"),
+            request.get("cancel_on_timeout", False),
+            request.get("grace_period", DEFAULT_GRACE_PERIOD),
+        )
+
+        try:
+            self.__perform(stack, job, request)
+            result: Dict = {"result": "success"}
+        except StackTimeoutError as exception:
+            result = {"result": "failure", "error": str(exception), "timed_out": True}
+        except (
+            ClientError,
+            KeyError,
+            ParameterError,
+            RuntimeError,
+            TemplateError,
+        ) as exception:
+            result = {"result": "failure", "error": str(exception)}
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            message = f"{job.action} job for stack {job.stack_name} failed unexpectedly"
+            logger.exception(message)
+            result = {"result": "failure", "error": f"{message}: {exception!r}"}
+        finally:
+            with self.__lock:
+                del self.__jobs[job.stack_name]
+
+        job.finish(result)
+
+    @staticmethod
+    def __perform(stack: Stack, job: Job, request: Dict):
+        """Performs the job's action against the stack, raising if it doesn't succeed"""
+        if job.action == "deploy":
+            stack.set_capabilities(request.get("capabilities", []))
+            stack.set_notifications(request.get("notification_arns", []))
+            stack.set_auto_recover(
+                request.get("auto_recover", False),
+                request.get("skippable_resources", []),
+            )
+            stack.deploy(
+                request["template_body"],
+                request.get("parameters", {}),
+                request.get("tags", {}),
+            )
+        elif job.action == "delete":
+            stack.delete()
+        else:
+            stack_status = stack.wait()
+            if stack_status not in SUCCESSFUL_STACK_STATUSES:
+                raise RuntimeError(f"{job.stack_name} is in {stack_status} status")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Accepts a single JSON job request and streams the job's messages back as JSON lines"""
+
+    def handle(self):
+        jobs: JobServer = self.server.jobs  # type: ignore
+
+        try:
+            job = jobs.submit(json.loads(self.rfile.readline()))
+        except ValueError as exception:
+            self.__send({"result": "failure", "error": str(exception)})
+            return
+
+        for message in iter(job.subscribe().get, None):
+            self.__send(message)
+
+        self.__send(job.result or {})
+
+    def __send(self, message: Dict):
+        """Writes a message as a line of JSON"""
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], jobs: JobServer):
+        self.jobs = jobs
+        super().__init__(address, _RequestHandler)
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, address: str, jobs: JobServer):
+        self.jobs = jobs
+        super().__init__(address, _RequestHandler)
+
+
+def is_loopback(host: str) -> bool:
+    """Returns whether a host name or IP address only refers to this machine"""
+    if host == "localhost":
+        return True
+
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def create_server(address: str, jobs: JobServer) -> socketserver.BaseServer:
+    """Creates a server listening on a localhost port or a Unix socket
+
+    Jobs run with the server's AWS credentials and aren't authenticated, so a ValueError is raised for TCP addresses
+    that aren't loopback, and for paths that exist but aren't a socket (rather than deleting them).
+    """
+    parsed_address = parse_address(address)
+
+    if isinstance(parsed_address, tuple):
+        if not is_loopback(parsed_address[0]):
+            raise ValueError(
+                f"Refusing to listen on {address}: only loopback addresses are allowed"
+            )
+
+        return _TCPServer(parsed_address, jobs)
+
+    if os.path.lexists(parsed_address):
+        if not stat.S_ISSOCK(os.lstat(parsed_address).st_mode):
+            raise ValueError(
+                f"Refusing to listen on {address}: it exists and is not a socket"
+            )
+
+        os.unlink(parsed_address)
+
+    return _UnixServer(parsed_address, jobs)
+
+
+def submit(address: str, request: Dict) -> bool:
+    """Submits a job to a running server, logging its events until it finishes. Returns whether it succeeded
+
+    Raises a StackTimeoutError if the job's stack did not stabilise in time.
+    """
+    parsed_address = parse_address(address)
+
+    if isinstance(parsed_address, tuple):
+        connection = socket.create_connection(parsed_address)
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(parsed_address)
+
+    with connection, connection.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+
+        for line in stream:
+            message = json.loads(line)
+
+            if "event" in message:
+                log_event(
+                    message["event"]["logical_resource_id"],
+                    message["event"]["resource_status"],
+                    message["event"]["status_reason"],
+                )
+                continue
+
+            if message.get("result") == "success":
+                return True
+
+            logger.error(message.get("error", "Job did not complete"))
+            if message.get("timed_out"):
+                raise StackTimeoutError(message["error"])
+
+            return False
+
+    logger.error("Connection to the server closed before the job finished")
+    return False
@@ -0,0 +1,147 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from .events import StackEvent
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_FLUSH_TIMEOUT = 30.0
+
+# Callbacks that may be dropped when a threaded sink falls behind. Others report the stack's lifecycle, so never are
+DROPPABLE_CALLBACKS = frozenset({"on_event", "on_poll"})
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class EventSink:
+    """Receives the events of a stack being waited on, and changes to its status
+
+    Subclasses override the callbacks they need. Callbacks run on the thread that is waiting for the stack, so sinks
+    that may be slow (e.g. posting to a webhook) should be wrapped in a ThreadedSink.
+    """
+
+    elapsed: float = 0.0
+    calls: int = 0
+
+    @property
+    def name(self) -> str:
+        """The name the sink is reported under"""
+        return type(self).__name__
+
+    def on_event(self, event: StackEvent):
+        """Called with each new stack event, oldest first"""
+
+    def on_status_change(self, stack_name: str, stack_status: str):
+        """Called whenever the stack's status is seen to change while waiting"""
+
+    def on_poll(self, stack_name: str, stack_status: str):
+        """Called each time the stack's status is checked while waiting, whether or not anything changed"""
+
+    def on_finish(self, stack_name: str, stack_status: str):
+        """Called once the stack has stabilised, with its final status"""
+
+    def flush(
+        self, timeout: Optional[float] = None  # pylint: disable=unused-argument
+    ) -> bool:
+        """Waits (up to the timeout) for the callbacks delivered so far to be handled. Returns whether they were
+
+        Callbacks are handled as they are delivered, unless the sink runs them on another thread.
+        """
+        return True
+
+    def deliver(self, callback: str, *args):
+        """Calls one of the sink's callbacks, timing it and logging (rather than raising) any exception"""
+        started = time.perf_counter()
+        try:
+            getattr(self, callback)(*args)
+        except Exception:  # pylint: disable=broad-exception-caught
+            message = f"Event sink {self.name} failed in {callback}"
+            logger.exception(message)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.calls += 1
+
+
+class CallbackSink(EventSink):
+    """Sink that passes each stack event to a callable"""
+
+    def __init__(self, callback: Callable[[StackEvent], None]):
+        self.callback = callback
+
+    @property
+    def name(self) -> str:
+        return getattr(self.callback, "__name__", super().name)
+
+    def on_event(self, event: StackEvent):
+        self.callback(event)
+
+
+class ThreadedSink(EventSink):
+    """Runs another sink's callbacks on a thread of its own, so it can never delay polling
+
+    Callbacks are passed to the thread through a queue. When `queue_size` callbacks are already queued, events and
+    polls are dropped and counted rather than waited for. Status changes and the final status are always queued, so
+    the sink sees the stack's lifecycle even when it falls behind.
+    """
+
+    sink: EventSink
+    queue_size: int
+    dropped: int
+
+    def __init__(self, sink: EventSink, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.sink = sink
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.__queue: "queue.Queue[tuple]" = queue.Queue()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    @property
+    def name(self) -> str:
+        return self.sink.name
+
+    @property
+    def elapsed(self) -> float:  # type: ignore[override]
+        """The time the wrapped sink has spent in its callbacks, on its own thread"""
+        return self.sink.elapsed
+
+    def deliver(self, callback: str, *args):
+        """Queues the callback for the sink's thread, dropping events and polls if the queue is full"""
+        if callback in DROPPABLE_CALLBACKS and self.__queue.qsize() >= self.queue_size:
+            if not self.dropped:
+                warning = (
+                    f"Event sink {self.name} is falling behind, dropping callbacks"
+                )
+                logger.warning(warning)
+            self.dropped += 1
+            return
+
+        self.__queue.put((callback, args))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits (up to the timeout) for the callbacks queued so far to be delivered. Returns whether they were"""
+        flushed = threading.Event()
+        self.__queue.put((flushed, ()))
+
+        return flushed.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Waits (up to the timeout) for the queued callbacks to be delivered, then stops the sink's thread"""
+        self.__queue.put((None, ()))
+        self.__thread.join(timeout)
+
+    def __run(self):
+        """Delivers each queued callback to the sink, until closed"""
+        while True:
+            callback, args = self.__queue.get()
+            if callback is None:
+                return
+
+            if isinstance(callback, threading.Event):
+                callback.set()
+                continue
+
+            self.sink.deliver(callback, *args)
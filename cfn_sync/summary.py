@@ -0,0 +1,73 @@
+import time
+
+from .cloudformation import log, log_event
+from .events import StackEvent
+from .resources import ResourceIndex
+from .sinks import EventSink
+
+DEFAULT_SUMMARY_INTERVAL = 10.0
+
+# The most resources in progress named in each summary
+MAX_LISTED_RESOURCES = 10
+
+
+class SummaryReporter(EventSink):
+    """Event sink that logs aggregate progress once per interval while waiting, instead of every event
+
+    Failures and the stack's own events are still logged as they happen. Summaries are read from the index the stack
+    keeps (`Stack.resources`), so the reporter must be called on the waiting thread, not wrapped in a ThreadedSink.
+    """
+
+    resources: ResourceIndex
+    interval: float
+
+    def __init__(
+        self, resources: ResourceIndex, interval: float = DEFAULT_SUMMARY_INTERVAL
+    ):
+        self.resources = resources
+        self.interval = interval
+        self.__logged_at = time.monotonic()
+
+    def on_event(self, event: StackEvent):
+        """Logs the event if it is a failure or a change to the stack, and a summary if one is due"""
+        if event.is_stack_event or event.resource_status.endswith("_FAILED"):
+            log_event(
+                event.logical_resource_id, event.resource_status, event.status_reason
+            )
+
+        self.__log_summary_if_due()
+
+    def on_poll(self, stack_name: str, stack_status: str):
+        """Logs a summary if one is due, so a stack stuck without new events is still reported on"""
+        self.__log_summary_if_due()
+
+    def on_finish(self, stack_name: str, stack_status: str):
+        """Logs a final summary"""
+        self.log_summary()
+
+    def log_summary(self):
+        """Logs the number of resources in each status, and the resources that have been in progress longest"""
+        self.__logged_at = time.monotonic()
+        counts = self.resources.counts()
+        if not counts:
+            return
+
+        summary = f"Summary: {len(self.resources)} resources - " + ", ".join(
+            f"{count} {status}" for status, count in sorted(counts.items())
+        )
+
+        in_progress = sum(
+            count for status, count in counts.items() if status.endswith("_IN_PROGRESS")
+        )
+        if in_progress:
+            listed = self.resources.in_progress(MAX_LISTED_RESOURCES)
+            summary += f"; in progress: {', '.join(listed)}"
+            if in_progress > len(listed):
+                summary += f" (+{in_progress - len(listed)} more)"
+
+        log(summary)
+
+    def __log_summary_if_due(self):
+        """Logs a summary if the interval has passed since the last"""
+        if time.monotonic() - self.__logged_at >= self.interval:
+            self.log_summary()
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+INTRINSIC_FUNCTIONS = frozenset(
+    {
+        "And",
+        "Base64",
+        "Cidr",
+        "Equals",
+        "FindInMap",
+        "ForEach",
+        "GetAtt",
+        "GetAZs",
+        "If",
+        "ImportValue",
+        "Join",
+        "Length",
+        "Not",
+        "Or",
+        "Select",
+        "Split",
+        "Sub",
+        "ToJsonString",
+        "Transform",
+    }
+)
+
+CACHE_SIZE = 16
+
+_parsed_templates: "OrderedDict[str, Tuple[Dict, List[str]]]" = OrderedDict()
+# Guards the cache, which is shared by the stacks deployed concurrently by the fleet and server
+_cache_lock = threading.Lock()
+
+
+class TemplateError(ValueError):
+    """Raised when a template can't be parsed"""
+
+
+class ParameterError(ValueError):
+    """Raised when the parameters given for a deploy don't match those the template declares"""
+
+
+class CloudFormationLoader(yaml.SafeLoader):  # pylint: disable=too-many-ancestors
+    """YAML loader that understands the short form of CloudFormation intrinsic functions, e.g. !Ref and !GetAtt,
+    and records duplicate keys rather than silently keeping the last"""
+
+    duplicate_keys: List[str]
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.duplicate_keys = []
+
+    def construct_mapping(self, node, deep=False):
+        keys = set()
+        for key_node, _ in node.value:
+            key = self.construct_object(key_node, deep=deep)
+            if key in keys:
+                self.duplicate_keys.append(
+                    f"{key} (line {key_node.start_mark.line + 1})"
+                )
+            keys.add(key)
+
+        return super().construct_mapping(node, deep=deep)
+
+
+def _construct_intrinsic(loader: CloudFormationLoader, tag_suffix: str, node):
+    """Constructs the long form of an intrinsic function from its short form tag"""
+    value: Any
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+        if tag_suffix == "GetAtt":
+            value = value.split(".", 1)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+
+    if tag_suffix in INTRINSIC_FUNCTIONS:
+        return {f"Fn::{tag_suffix}": value}
+
+    return {tag_suffix: value}
+
+
+CloudFormationLoader.add_multi_constructor("!", _construct_intrinsic)
+
+
+def template_digest(template_body: str) -> str:
+    """Returns the SHA-256 digest of a template body"""
+    return hashlib.sha256(template_body.encode("utf-8")).hexdigest()
+
+
+def parse_template(template_body: str) -> Dict:
+    """Parses a JSON or YAML template, reusing the result for templates that have been parsed recently
+
+    The result is shared, so must not be modified.
+    """
+    return _parse(template_body)[0]
+
+
+def duplicate_keys(template_body: str) -> List[str]:
+    """Returns the keys that appear more than once in the same mapping of a template"""
+    return _parse(template_body)[1]
+
+
+def _parse(template_body: str) -> Tuple[Dict, List[str]]:
+    """Parses a template and finds its duplicate keys, caching the result by the template's digest"""
+    digest = template_digest(template_body)
+    cached = _cached(digest)
+    if cached is not None:
+        return cached
+
+    duplicates: List[str] = []
+
+    def json_object(pairs: List[Tuple[str, Any]]) -> Dict:
+        result: Dict = {}
+        for key, value in pairs:
+            if key in result:
+                duplicates.append(key)
+            result[key] = value
+        return result
+
+    try:
+        if template_body.lstrip().startswith("{"):
+            template = json.loads(template_body, object_pairs_hook=json_object)
+        else:
+            loader = CloudFormationLoader(template_body)
+            try:
+                template = loader.get_single_data()
+                duplicates = loader.duplicate_keys
+            finally:
+                loader.dispose()
+    except (ValueError, yaml.YAMLError) as exception:
+        raise TemplateError(f"Unable to parse template: {exception}") from exception
+
+    if not isinstance(template, dict):
+        raise TemplateError("Template is not a mapping")
+
+    _cache(digest, (template, duplicates))
+
+    return template, duplicates
+
+
+def _cached(digest: str) -> Optional[Tuple[Dict, List[str]]]:
+    """Returns the cached result of parsing the template with the given digest, if any"""
+    with _cache_lock:
+        if digest not in _parsed_templates:
+            return None
+
+        _parsed_templates.move_to_end(digest)
+        return _parsed_templates[digest]
+
+
+def _cache(digest: str, parsed: Tuple[Dict, List[str]]):
+    """Caches the result of parsing a template, evicting the least recently used result once the cache is full"""
+    with _cache_lock:
+        _parsed_templates[digest] = parsed
+        if len(_parsed_templates) > CACHE_SIZE:
+            _parsed_templates.popitem(last=False)
+
+
+def merge_parameters(
+    declared: Dict[str, Dict],
+    parameters: Dict[str, str],
+    previous: Optional[Iterable[str]] = None,
+) -> List[Dict]:
+    """Builds the Parameters of a create/update request
+
+    Parameters that are not given keep their previous value where the stack has one, and otherwise fall back to
+    the template's default. Raises a ParameterError listing any parameters the template doesn't declare, and any
+    without a value or default.
+    """
+    previous = set(previous or [])
+    unknown = sorted(set(parameters) - set(declared))
+
+    merged: List[Dict] = [
+        {"ParameterKey": key, "ParameterValue": value}
+        for key, value in parameters.items()
+    ]
+    missing = []
+
+    for key, declaration in declared.items():
+        if key in parameters:
+            continue
+
+        if key in previous:
+            merged.append({"ParameterKey": key, "UsePreviousValue": True})
+        elif not isinstance(declaration, dict) or "Default" not in declaration:
+            missing.append(key)
+
+    errors = []
+    if unknown:
+        errors.append(f"not declared by the template: {', '.join(unknown)}")
+    if missing:
+        errors.append(f"without a value: {', '.join(missing)}")
+    if errors:
+        raise ParameterError(f"Invalid parameters - {'; '.join(errors)}")
+
+    return merged
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .cloudformation import log
+
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_INTERVAL = 0.5
+
+
+class TemplateWatcher:  # pylint: disable=too-many-instance-attributes
+    """Deploys whenever the watched files change, waiting for bursts of saves to settle and
+    keeping at most one deploy queued behind the one in progress"""
+
+    paths: List[str]
+    debounce: float
+    interval: float
+
+    def __init__(
+        self,
+        paths: List[str],
+        deploy: Callable[[], None],
+        debounce: float = DEFAULT_DEBOUNCE,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.paths = paths
+        self.deploy = deploy
+        self.debounce = debounce
+        self.interval = interval
+        self.__stats = self.__snapshot()
+        self.__changed_at: Optional[float] = None
+        self.__digest: Optional[str] = None
+        self.__pending = False
+        self.__condition = threading.Condition()
+
+    def digest(self) -> str:
+        """Returns a digest of the watched files' contents. Raises an OSError if any can't be read"""
+        digest = hashlib.sha256()
+        for path in self.paths:
+            with open(path, "rb") as watched_file:
+                digest.update(hashlib.sha256(watched_file.read()).digest())
+
+        return digest.hexdigest()
+
+    def submit(self) -> bool:
+        """Queues a deploy, unless the files' content matches the last deploy queued or a file can't be read (e.g.
+        part way through an editor's rename-save). Returns whether one was queued"""
+        try:
+            digest = self.digest()
+        except OSError as exception:
+            log(
+                f"Unable to read the template or parameters, not deploying: {exception}"
+            )
+            return False
+
+        with self.__condition:
+            if digest == self.__digest:
+                log("No changes to the template or parameters, not deploying")
+                return False
+
+            self.__digest = digest
+            self.__pending = True
+            self.__condition.notify()
+
+        return True
+
+    def poll(self, now: float):
+        """Checks the watched files for changes, queueing a deploy once they have stopped changing"""
+        stats = self.__snapshot()
+        if stats != self.__stats:
+            self.__stats = stats
+            self.__changed_at = now
+            return
+
+        if self.__changed_at is not None and now - self.__changed_at >= self.debounce:
+            self.__changed_at = None
+            self.submit()
+
+    def deploy_pending(self, block: bool = False) -> bool:
+        """Performs the queued deploy, if any. Returns whether one was performed
+
+        A failed deploy is logged rather than raised, so the watcher keeps running.
+        """
+        with self.__condition:
+            while block and not self.__pending:
+                self.__condition.wait()
+
+            if not self.__pending:
+                return False
+
+            self.__pending = False
+            digest = self.__digest
+
+        try:
+            self.deploy()
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            log(f"Deploy failed: {exception}")
+            # Let the same content be deployed again, e.g. after a throttling or credentials error
+            with self.__condition:
+                if self.__digest == digest:
+                    self.__digest = None
+
+        log("Watching for changes")
+
+        return True
+
+    def run(self):
+        """Deploys, then watches the files and deploys again whenever they change, forever"""
+        threading.Thread(target=self.__deploy_forever, daemon=True).start()
+        self.submit()
+
+        while True:
+            time.sleep(self.interval)
+            self.poll(time.monotonic())
+
+    def __deploy_forever(self):
+        """Performs each queued deploy as it is queued"""
+        while True:
+            self.deploy_pending(block=True)
+
+    def __snapshot(self) -> List[Optional[Tuple[int, int]]]:
+        """Returns the modification time and size of each watched file"""
+        stats: List[Optional[Tuple[int, int]]] = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+
+        return stats
@@ -30,6 +30,6 @@ if __name__ == "__main__":
             entry_points={"console_scripts": ["cfn-sync = cfn_sync:main"]},
             python_requires=">=3.9",
             setup_requires=["setuptools >= 18.0", "setuptools_scm"],
-            install_requires=["boto3>=1.12.0"],
+            install_requires=["boto3>=1.12.0", "PyYAML>=5.1"],
             test_suite="tests",
         )
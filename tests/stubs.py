@@ -1,9 +1,17 @@
+import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 
 from botocore.stub import ANY
 
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def at(seconds: int) -> datetime:
+    """Returns a timestamp the given number of seconds after START"""
+    return START + timedelta(seconds=seconds)
+
 
 def generate_stack_id(stack_name: str) -> str:
     """Generate a stack ID from the stack name"""
@@ -83,7 +91,11 @@ def stub_add_tags_to_resource(stubber, name: str, tags: List[Dict]):
 
 
 def stub_describe_stack(
-    stubber, stack_name: str, status: str, use_stack_id: bool = False
+    stubber,
+    stack_name: str,
+    status: str,
+    use_stack_id: bool = False,
+    parameters: Optional[Dict[str, str]] = None,
 ):
     """Stubs CloudFormation describe_stacks responses"""
     stack_id = generate_stack_id(stack_name)
@@ -94,6 +106,10 @@ def stub_describe_stack(
                 "StackId": stack_id,
                 "StackStatus": status,
                 "CreationTime": datetime(2020, 1, 1),
+                "Parameters": [
+                    {"ParameterKey": key, "ParameterValue": value}
+                    for key, value in (parameters or {}).items()
+                ],
             }
         ]
     }
@@ -130,20 +146,21 @@ def stub_update_stack(
     parameters: List[Dict],
     tags: List[Dict],
     capabilities: Optional[List] = None,
+    notification_arns: Optional[List] = None,
 ):  # pylint: disable=too-many-arguments too-many-positional-arguments
     """Stubs CloudFormation update_stack responses"""
     response = {"StackId": generate_stack_id(stack_name)}
-    stubber.add_response(
-        "update_stack",
-        response,
-        expected_params={
-            "StackName": stack_name,
-            "TemplateBody": template_body,
-            "Parameters": parameters,
-            "Tags": tags,
-            "Capabilities": capabilities or [],
-        },
-    )
+    expected_params = {
+        "StackName": stack_name,
+        "TemplateBody": template_body,
+        "Parameters": parameters,
+        "Tags": tags,
+        "Capabilities": capabilities or [],
+    }
+    if notification_arns:
+        expected_params["NotificationARNs"] = notification_arns
+
+    stubber.add_response("update_stack", response, expected_params=expected_params)
 
 
 def stub_update_stack_error(
@@ -205,6 +222,28 @@ def stub_create_stack_error(stubber, error_message: str):
     )
 
 
+def stub_cancel_update_stack(stubber, stack_name: str):
+    """Stubs CloudFormation cancel_update_stack responses"""
+    stubber.add_response(
+        "cancel_update_stack",
+        {},
+        expected_params={"StackName": generate_stack_id(stack_name)},
+    )
+
+
+def stub_continue_update_rollback(
+    stubber, stack_name: str, resources_to_skip: Optional[List[str]] = None
+):
+    """Stubs CloudFormation continue_update_rollback responses"""
+    expected_params: Dict = {"StackName": generate_stack_id(stack_name)}
+    if resources_to_skip:
+        expected_params["ResourcesToSkip"] = resources_to_skip
+
+    stubber.add_response(
+        "continue_update_rollback", {}, expected_params=expected_params
+    )
+
+
 def stub_delete_stack(stubber, stack_name: str):
     """Stubs CloudFormation delete_stack responses"""
     stubber.add_response(
@@ -260,3 +299,140 @@ def stub_describe_stack_events(stubber, stack_name: str, use_stack_id: bool = Fa
         response,
         expected_params={"StackName": stack_name_param},
     )
+
+
+def generate_notification(
+    stack_name: str,
+    logical_resource_id: str,
+    resource_status: str,
+    resource_type: str = "AWS::CloudFormation::Stack",
+) -> Dict:
+    """Generate an SQS message carrying an SNS stack event notification"""
+    stack_id = generate_stack_id(stack_name)
+    physical_resource_id = stack_id if logical_resource_id == stack_name else "null"
+    message = (
+        f"StackId='{stack_id}'\n"
+        "Timestamp='2020-01-01T00:00:00.000Z'\n"
+        f"EventId='{uuid.uuid4()}'\n"
+        f"LogicalResourceId='{logical_resource_id}'\n"
+        "Namespace='123456789012'\n"
+        f"PhysicalResourceId='{physical_resource_id}'\n"
+        "ResourceProperties='null'\n"
+        f"ResourceStatus='{resource_status}'\n"
+        "ResourceStatusReason=''\n"
+        f"ResourceType='{resource_type}'\n"
+        f"StackName='{stack_name}'\n"
+        "ClientRequestToken='null'\n"
+    )
+
+    return {
+        "MessageId": str(uuid.uuid4()),
+        "ReceiptHandle": str(uuid.uuid4()),
+        "Body": json.dumps({"Type": "Notification", "Message": message}),
+    }
+
+
+def generate_stack_event(  # pylint: disable=too-many-arguments too-many-positional-arguments
+    stack_name: str,
+    logical_resource_id: str,
+    resource_status: str,
+    timestamp: datetime,
+    resource_type: str = "AWS::CloudFormation::Stack",
+    status_reason: Optional[str] = None,
+) -> Dict:
+    """Generate a CloudFormation stack event"""
+    stack_id = generate_stack_id(stack_name)
+    event = {
+        "StackId": stack_id,
+        "EventId": str(uuid.uuid4()),
+        "StackName": stack_name,
+        "LogicalResourceId": logical_resource_id,
+        "PhysicalResourceId": (
+            stack_id if logical_resource_id == stack_name else logical_resource_id
+        ),
+        "ResourceType": resource_type,
+        "Timestamp": timestamp,
+        "ResourceStatus": resource_status,
+    }
+    if status_reason:
+        event["ResourceStatusReason"] = status_reason
+
+    return event
+
+
+def stub_describe_stack_events_page(
+    stubber,
+    stack_name: str,
+    events: List[Dict],
+    next_token: Optional[str] = None,
+    token: Optional[str] = None,
+):  # pylint: disable=too-many-arguments too-many-positional-arguments
+    """Stubs a page of CloudFormation describe_stack_events responses"""
+    response: Dict = {"StackEvents": events}
+    if next_token:
+        response["NextToken"] = next_token
+
+    expected_params = {"StackName": stack_name}
+    if token:
+        expected_params["NextToken"] = token
+
+    stubber.add_response(
+        "describe_stack_events", response, expected_params=expected_params
+    )
+
+
+def stub_describe_stacks_page(
+    stubber,
+    stacks: List[Dict],
+    next_token: Optional[str] = None,
+    token: Optional[str] = None,
+):
+    """Stubs a page of CloudFormation describe_stacks responses for every stack in the account"""
+    response: Dict = {
+        "Stacks": [
+            {
+                "StackName": stack["StackName"],
+                "StackId": generate_stack_id(stack["StackName"]),
+                "StackStatus": stack["StackStatus"],
+                "CreationTime": datetime(2020, 1, 1),
+            }
+            for stack in stacks
+        ]
+    }
+    if next_token:
+        response["NextToken"] = next_token
+
+    stubber.add_response(
+        "describe_stacks",
+        response,
+        expected_params={"NextToken": token} if token else {},
+    )
+
+
+def stub_list_stacks_page(
+    stubber,
+    stacks: List[Dict],
+    statuses: List[str],
+    next_token: Optional[str] = None,
+    token: Optional[str] = None,
+):  # pylint: disable=too-many-arguments too-many-positional-arguments
+    """Stubs a page of CloudFormation list_stacks responses"""
+    response: Dict = {
+        "StackSummaries": [
+            {
+                "StackName": stack["StackName"],
+                "StackId": generate_stack_id(stack["StackName"]),
+                "StackStatus": stack["StackStatus"],
+                "CreationTime": datetime(2020, 1, 1),
+            }
+            for stack in stacks
+        ]
+    }
+    if next_token:
+        response["NextToken"] = next_token
+
+    expected_params: Dict = {"StackStatusFilter": statuses}
+    if token:
+        expected_params["NextToken"] = token
+
+    stubber.add_response("list_stacks", response, expected_params=expected_params)
@@ -1,13 +1,22 @@
 # pylint:disable=redefined-outer-name
+import time
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
 from botocore.exceptions import ClientError  # type: ignore
 
 from cfn_sync import cloudformation
+from cfn_sync.events import StackEvent
+from cfn_sync.preflight import PreflightError
+from cfn_sync.template import ParameterError
 
 from .conftest import StubbedClient
 from .stubs import (
+    generate_stack_event,
+    generate_stack_id,
+    stub_cancel_update_stack,
+    stub_continue_update_rollback,
     stub_create_stack,
     stub_create_stack_error,
     stub_delete_stack,
@@ -15,6 +24,7 @@ from .stubs import (
     stub_describe_stack,
     stub_describe_stack_error,
     stub_describe_stack_events,
+    stub_describe_stack_events_page,
     stub_update_stack,
     stub_update_stack_error,
 )
@@ -83,10 +93,10 @@ def test_deploy_update_success(
         fake_cloudformation_client.stub,
         "MyStack",
         demo_template,
-        [{"ParameterKey": "Hello", "ParameterValue": "You"}],
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
         [{"Key": "MyTag", "Value": "TagValue"}],
     )
-    stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, False)
+    stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, False)
 
 
 def test_deploy_update_capabilities_success(
@@ -100,12 +110,12 @@ def test_deploy_update_capabilities_success(
         fake_cloudformation_client.stub,
         "MyStack",
         demo_template,
-        [{"ParameterKey": "Hello", "ParameterValue": "You"}],
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
         [{"Key": "MyTag", "Value": "TagValue"}],
         ["CAPABILITY_IAM"],
     )
     stack.set_capabilities(["CAPABILITY_IAM"])
-    stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, False)
+    stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, False)
 
 
 def test_deploy_update_failure(
@@ -116,13 +126,13 @@ def test_deploy_update_failure(
     """Tests Stack.deploy() update failure cases"""
     stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
     stub_update_stack_error(fake_cloudformation_client.stub)
-    stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, False)
+    stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, False)
 
     # Test some other kind of error
     stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
     stub_update_stack_error(fake_cloudformation_client.stub, "Template invalid")
     with pytest.raises(ClientError):
-        stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, False)
+        stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, False)
 
 
 def test_deploy_create_success(
@@ -138,12 +148,12 @@ def test_deploy_create_success(
         fake_cloudformation_client.stub,
         "MyStack",
         demo_template,
-        [{"ParameterKey": "Hello", "ParameterValue": "You"}],
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
         [{"Key": "MyTag", "Value": "TagValue"}],
     )
     stack.deploy(
         demo_template,
-        {"Hello": "You"},
+        {"MyParam": "You"},
         {"MyTag": "TagValue"},
         False,
     )
@@ -160,7 +170,7 @@ def test_deploy_create_failure(
     )  # to trigger create workflow
     stub_create_stack_error(fake_cloudformation_client.stub, "Template invalid")
     with pytest.raises(ClientError):
-        stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, False)
+        stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, False)
 
 
 def test_delete_success(
@@ -182,31 +192,32 @@ def test_delete_failure(
         stack.delete(False)
 
 
+@patch("time.sleep")
 def test_delete_wait_success(
-    fake_cloudformation_client: StubbedClient, stack: cloudformation.Stack
+    patched_sleep: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
 ):
     """Tests Stack.delete(wait=True) successful cases"""
     stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
     stub_delete_stack(fake_cloudformation_client.stub, "MyStack")
-    stub_describe_stack(
-        fake_cloudformation_client.stub, "MyStack", "DELETE_COMPLETE", True
-    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack(
         fake_cloudformation_client.stub, "MyStack", "DELETE_COMPLETE", True
     )
     stack.delete(True)
+    patched_sleep.assert_called_once()
 
 
+@patch("time.sleep")
 def test_delete_wait_failure(
-    fake_cloudformation_client: StubbedClient, stack: cloudformation.Stack
+    _: MagicMock, fake_cloudformation_client: StubbedClient, stack: cloudformation.Stack
 ):
     """Tests Stack.delete(wait=True) failure cases"""
     stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
     stub_delete_stack(fake_cloudformation_client.stub, "MyStack")
-    stub_describe_stack(
-        fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE", True
-    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack(
         fake_cloudformation_client.stub, "MyStack", "DELETE_FAILED", True
@@ -215,7 +226,9 @@ def test_delete_wait_failure(
         stack.delete(True)
 
 
+@patch("time.sleep")
 def test_deploy_wait_success(
+    patched_sleep: MagicMock,
     fake_cloudformation_client: StubbedClient,
     stack: cloudformation.Stack,
     demo_template: str,
@@ -226,20 +239,67 @@ def test_deploy_wait_success(
         fake_cloudformation_client.stub,
         "MyStack",
         demo_template,
-        [{"ParameterKey": "Hello", "ParameterValue": "You"}],
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
         [{"Key": "MyTag", "Value": "TagValue"}],
     )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack(
-        fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE", True
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE", True
     )
+    stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, True)
+    patched_sleep.assert_called_once()
+    assert set(stack.timings) == {"describe", "preflight", "submit", "wait"}
+    assert "Something" in stack.resources
+
+
+@patch("time.sleep")
+def test_deploy_timeout_cancels_update(
+    patched_sleep: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy(wait=True) cancels the update once it times out, and follows the rollback"""
+    stack.set_timeout(timeout=0, cancel=True, grace_period=60)
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    stub_update_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        demo_template,
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
+        [],
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_cancel_update_stack(fake_cloudformation_client.stub, "MyStack")
     stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack(
-        fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE", True
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_COMPLETE", True
     )
-    stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, True)
+    with pytest.raises(
+        cloudformation.StackTimeoutError, match="UPDATE_ROLLBACK_COMPLETE"
+    ):
+        stack.deploy(demo_template, {"MyParam": "You"}, {}, True)
+    patched_sleep.assert_called_once()
 
 
+@patch("time.sleep")
+def test_wait_deadline(
+    patched_sleep: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+):
+    """Tests Stack.wait() stops waiting once the deadline has passed"""
+    stack.set_timeout(timeout=3600, deadline=time.time() - 1, cancel=True)
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+    with pytest.raises(cloudformation.StackTimeoutError, match="CREATE_IN_PROGRESS"):
+        stack.wait("CREATE_IN_PROGRESS")
+    patched_sleep.assert_not_called()
+
+
+@patch("time.sleep")
 def test_deploy_wait_failure(
+    _: MagicMock,
     fake_cloudformation_client: StubbedClient,
     stack: cloudformation.Stack,
     demo_template: str,
@@ -250,18 +310,255 @@ def test_deploy_wait_failure(
         fake_cloudformation_client.stub,
         "MyStack",
         demo_template,
-        [{"ParameterKey": "Hello", "ParameterValue": "You"}],
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
         [{"Key": "MyTag", "Value": "TagValue"}],
     )
-    stub_describe_stack(
-        fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE", True
-    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
     stub_describe_stack(
         fake_cloudformation_client.stub, "MyStack", "ROLLBACK_COMPLETE", True
     )
     with pytest.raises(Exception):
-        stack.deploy(demo_template, {"Hello": "You"}, {"MyTag": "TagValue"}, True)
+        stack.deploy(demo_template, {"MyParam": "You"}, {"MyTag": "TagValue"}, True)
+
+
+@patch("time.sleep")
+def test_deploy_auto_recover(
+    _: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy() recovers a stack whose rollback failed, skipping allowed resources, and retries"""
+    stack.set_auto_recover(skippable_resources=["Queue"])
+    stack_id = generate_stack_id("MyStack")
+    failures = [
+        generate_stack_event("MyStack", name, "UPDATE_FAILED", datetime(2020, 1, 1))
+        for name in ("Queue", "Table")
+    ]
+    parameters = [{"ParameterKey": "MyParam", "ParameterValue": "You"}]
+
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    stub_update_stack(
+        fake_cloudformation_client.stub, "MyStack", demo_template, parameters, []
+    )
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, [])
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, failures)
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_FAILED", True
+    )
+    stub_continue_update_rollback(fake_cloudformation_client.stub, "MyStack", ["Queue"])
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_COMPLETE", True
+    )
+    stub_update_stack(
+        fake_cloudformation_client.stub, "MyStack", demo_template, parameters, []
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE", True
+    )
+
+    stack.deploy(demo_template, {"MyParam": "You"}, {}, True)
+    assert {"recover", "retry", "retry wait"} <= set(stack.timings)
+
+
+@patch("time.sleep")
+def test_deploy_auto_recover_before_deploying(
+    _: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy() recovers a stack already stuck in UPDATE_ROLLBACK_FAILED, finding the failed resources
+    from the events of its latest rollback rather than an earlier wait's index, and only skipping UPDATE_FAILED
+    ones"""
+    stack.set_auto_recover(skippable_resources=["Stale", "Table", "Earlier", "Bucket"])
+    stack.resources.update(
+        StackEvent(
+            generate_stack_event(
+                "MyStack", "Stale", "UPDATE_FAILED", datetime(2019, 1, 1)
+            )
+        )
+    )
+    stack_id = generate_stack_id("MyStack")
+    parameters = [{"ParameterKey": "MyParam", "ParameterValue": "You"}]
+
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_FAILED"
+    )
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub,
+        stack_id,
+        [
+            generate_stack_event(
+                "MyStack", "Table", "UPDATE_FAILED", datetime(2020, 1, 3)
+            ),
+            generate_stack_event(
+                "MyStack", "Bucket", "DELETE_FAILED", datetime(2020, 1, 2)
+            ),
+            generate_stack_event(
+                "MyStack",
+                "MyStack",
+                "UPDATE_ROLLBACK_IN_PROGRESS",
+                datetime(2020, 1, 1),
+            ),
+            generate_stack_event(
+                "MyStack", "Earlier", "UPDATE_FAILED", datetime(2019, 12, 31)
+            ),
+        ],
+    )
+    stub_continue_update_rollback(fake_cloudformation_client.stub, "MyStack", ["Table"])
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_COMPLETE", True
+    )
+    stub_update_stack(
+        fake_cloudformation_client.stub, "MyStack", demo_template, parameters, []
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE", True
+    )
+
+    stack.deploy(demo_template, {"MyParam": "You"}, {}, True)
+    assert "retry" not in stack.timings
+
+
+@patch("time.monotonic")
+@patch("time.sleep")
+def test_deploy_auto_recover_shares_timeout(
+    patched_sleep: MagicMock,
+    patched_monotonic: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    demo_template: str,
+):
+    """Tests the recovery and retry of a deploy share its timeout, rather than each starting a new one"""
+    clock = [0.0]
+    patched_monotonic.side_effect = lambda: clock[0]
+    patched_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+
+    stack = cloudformation.Stack(
+        fake_cloudformation_client.client, "MyStack", wait_delay=600
+    )
+    stack.set_auto_recover()
+    stack.set_timeout(timeout=1000)
+    stack_id = generate_stack_id("MyStack")
+    parameters = [{"ParameterKey": "MyParam", "ParameterValue": "You"}]
+
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    stub_update_stack(
+        fake_cloudformation_client.stub, "MyStack", demo_template, parameters, []
+    )
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, [])
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, [])
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_FAILED", True
+    )
+    stub_continue_update_rollback(fake_cloudformation_client.stub, "MyStack")
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, [])
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, [])
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_ROLLBACK_COMPLETE", True
+    )
+    stub_update_stack(
+        fake_cloudformation_client.stub, "MyStack", demo_template, parameters, []
+    )
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, stack_id, [])
+
+    # 600s are spent on the deploy and 400s on the recovery, leaving none for the retry
+    with pytest.raises(cloudformation.StackTimeoutError, match="UPDATE_IN_PROGRESS"):
+        stack.deploy(demo_template, {"MyParam": "You"}, {}, True)
+    assert [call.args[0] for call in patched_sleep.call_args_list] == [600, 400]
+
+
+def test_deploy_preflight_before_api_calls(stack: cloudformation.Stack):
+    """Tests Stack.deploy() rejects an invalid template without calling CloudFormation"""
+    with pytest.raises(PreflightError, match="no Resources"):
+        stack.deploy("Resources: {}\n", {}, {}, True)
+
+    assert set(stack.timings) == {"preflight"}
+
+
+def test_deploy_prepares_template_while_describing(
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy() with a callable template body"""
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    stub_update_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        demo_template,
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
+        [],
+    )
+    stack.deploy(lambda: demo_template, {"MyParam": "You"}, {}, False)
+    assert set(stack.timings) == {"prepare", "describe", "preflight", "submit"}
+
+
+def test_deploy_update_falls_back_to_create(
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy() creates the stack when it disappears before the update"""
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    stub_update_stack_error(
+        fake_cloudformation_client.stub, "Stack [MyStack] does not exist"
+    )
+    stub_create_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        demo_template,
+        [{"ParameterKey": "MyParam", "ParameterValue": "You"}],
+        [],
+    )
+    stack.deploy(demo_template, {"MyParam": "You"}, {}, False)
+
+
+def test_deploy_keeps_previous_parameter_values(
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy() keeps the previous value of parameters that aren't given"""
+    stub_describe_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        "UPDATE_COMPLETE",
+        parameters={"MyParam": "Old", "EmptyParam": ""},
+    )
+    stub_update_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        demo_template,
+        [
+            {"ParameterKey": "EmptyParam", "ParameterValue": "New"},
+            {"ParameterKey": "MyParam", "UsePreviousValue": True},
+        ],
+        [],
+    )
+    stack.deploy(demo_template, {"EmptyParam": "New"}, {}, False)
+
+
+def test_deploy_rejects_invalid_parameters(
+    fake_cloudformation_client: StubbedClient,
+    stack: cloudformation.Stack,
+    demo_template: str,
+):
+    """Tests Stack.deploy() rejects unknown and missing parameters without calling CreateStack"""
+    stub_describe_stack_error(fake_cloudformation_client.stub)
+    with pytest.raises(
+        ParameterError, match="declared by the template: Hello.*MyParam"
+    ):
+        stack.deploy(demo_template, {"Hello": "You"}, {}, False)
 
 
 @patch("time.sleep")
@@ -0,0 +1,27 @@
+from cfn_sync.events import StackEvent, event_time
+
+from .stubs import START, generate_stack_event
+
+
+def test_event_time():
+    """Tests event_time() with API and notification timestamps"""
+    assert event_time({"Timestamp": START}) == START.timestamp()
+    assert event_time({"Timestamp": "2020-01-01T00:00:00.000Z"}) == START.timestamp()
+
+
+def test_stack_event():
+    """Tests StackEvent exposes an event's fields, and whether it is for the stack itself"""
+    event = StackEvent(
+        generate_stack_event(
+            "MyStack", "Queue", "CREATE_FAILED", START, "AWS::SQS::Queue", "Broken"
+        )
+    )
+    assert event.logical_resource_id == "Queue"
+    assert event.resource_type == "AWS::SQS::Queue"
+    assert event.status_reason == "Broken"
+    assert event.timestamp == START.timestamp()
+    assert not event.is_stack_event
+
+    assert StackEvent(
+        generate_stack_event("MyStack", "MyStack", "CREATE_COMPLETE", START)
+    ).is_stack_event
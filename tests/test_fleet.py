@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from cfn_sync import fleet
+
+from .conftest import StubbedClient
+from .stubs import (
+    generate_stack_event,
+    generate_stack_id,
+    stub_describe_stack_events_page,
+    stub_list_stacks_page,
+)
+
+
+def test_expand_status_filter():
+    """Tests expand_status_filter() expands groups and keeps plain statuses"""
+    assert fleet.expand_status_filter(["CREATE_COMPLETE"]) == ["CREATE_COMPLETE"]
+    assert "UPDATE_ROLLBACK_FAILED" in fleet.expand_status_filter(["failed"])
+    assert "DELETE_COMPLETE" not in fleet.expand_status_filter(["complete"])
+    assert "DELETE_COMPLETE" not in fleet.EXISTING_STACK_STATUSES
+
+
+def test_list_stacks_pages_and_prefix(fake_cloudformation_client: StubbedClient):
+    """Tests list_stacks() follows pages lazily and filters by prefix"""
+    statuses = ["CREATE_COMPLETE"]
+    stub_list_stacks_page(
+        fake_cloudformation_client.stub,
+        [
+            {"StackName": "app-one", "StackStatus": "CREATE_COMPLETE"},
+            {"StackName": "other", "StackStatus": "CREATE_COMPLETE"},
+        ],
+        statuses,
+        "page-2",
+    )
+    stub_list_stacks_page(
+        fake_cloudformation_client.stub,
+        [{"StackName": "app-two", "StackStatus": "CREATE_COMPLETE"}],
+        statuses,
+        token="page-2",
+    )
+
+    stacks = fleet.list_stacks(fake_cloudformation_client.client, "app-", statuses)
+    assert next(stacks)["StackName"] == "app-one"
+    assert [stack["StackName"] for stack in stacks] == ["app-two"]
+
+
+def test_with_failure_reasons(fake_cloudformation_client: StubbedClient):
+    """Tests with_failure_reasons() looks up the latest failure of failed stacks, keeping the order"""
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub,
+        generate_stack_id("broken"),
+        [
+            generate_stack_event(
+                "broken", "broken", "UPDATE_ROLLBACK_COMPLETE", datetime(2020, 1, 2)
+            ),
+            generate_stack_event(
+                "broken",
+                "Queue",
+                "UPDATE_FAILED",
+                datetime(2020, 1, 1),
+                "AWS::SQS::Queue",
+                "Queue name already exists",
+            ),
+        ],
+    )
+    summaries = [
+        {"StackName": "healthy", "StackStatus": "UPDATE_COMPLETE"},
+        {
+            "StackName": "broken",
+            "StackId": generate_stack_id("broken"),
+            "StackStatus": "UPDATE_ROLLBACK_COMPLETE",
+        },
+        {"StackName": "busy", "StackStatus": "UPDATE_IN_PROGRESS"},
+    ]
+
+    results = fleet.with_failure_reasons(
+        fake_cloudformation_client.client, summaries, concurrency=1
+    )
+    assert [(summary["StackName"], reason) for summary, reason in results] == [
+        ("healthy", None),
+        ("broken", "Queue name already exists"),
+        ("busy", None),
+    ]
@@ -0,0 +1,100 @@
+# pylint:disable=redefined-outer-name
+
+import pytest
+
+from cfn_sync.history import History
+
+from .conftest import StubbedClient
+from .stubs import at, generate_stack_event, stub_describe_stack_events_page
+
+
+@pytest.fixture
+def history(tmp_path) -> History:
+    """Create a History database in a temporary directory"""
+    with History(str(tmp_path / "history" / "events.sqlite")) as database:
+        yield database
+
+
+def test_sync_incremental(fake_cloudformation_client: StubbedClient, history: History):
+    """Tests History.sync() follows pages only back to the last stored event"""
+    first_deploy = [
+        generate_stack_event("MyStack", "MyStack", "CREATE_COMPLETE", at(60)),
+        generate_stack_event(
+            "MyStack", "Queue", "CREATE_COMPLETE", at(50), "AWS::SQS::Queue"
+        ),
+        generate_stack_event(
+            "MyStack", "Queue", "CREATE_IN_PROGRESS", at(10), "AWS::SQS::Queue"
+        ),
+        generate_stack_event("MyStack", "MyStack", "CREATE_IN_PROGRESS", at(0)),
+    ]
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub, "MyStack", first_deploy[:2], "page-2"
+    )
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub, "MyStack", first_deploy[2:], token="page-2"
+    )
+    assert history.sync(fake_cloudformation_client.client, "MyStack") == 4
+
+    second_deploy = [
+        generate_stack_event("MyStack", "MyStack", "UPDATE_ROLLBACK_COMPLETE", at(230)),
+        generate_stack_event(
+            "MyStack",
+            "Queue",
+            "UPDATE_FAILED",
+            at(200),
+            "AWS::SQS::Queue",
+            "Queue name already exists",
+        ),
+        generate_stack_event("MyStack", "MyStack", "UPDATE_IN_PROGRESS", at(100)),
+    ]
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        second_deploy + first_deploy[:1],
+        "page-2",
+    )
+    assert history.sync(fake_cloudformation_client.client, "MyStack") == 3
+
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub, "MyStack", second_deploy[:1], "page-2"
+    )
+    assert history.sync(fake_cloudformation_client.client, "MyStack") == 0
+
+    deploys = list(history.deploys(["MyStack"]))
+    assert [(run["operation"], run["duration"], run["status"]) for run in deploys] == [
+        ("CREATE", 60, "CREATE_COMPLETE"),
+        ("UPDATE", 130, "UPDATE_ROLLBACK_COMPLETE"),
+    ]
+    assert not list(history.deploys(["OtherStack"]))
+
+    # an overlapping deploy of another stack is listed by when it started, not when it finished
+    stub_describe_stack_events_page(
+        fake_cloudformation_client.stub,
+        "OtherStack",
+        [
+            generate_stack_event(
+                "OtherStack", "OtherStack", "CREATE_COMPLETE", at(300)
+            ),
+            generate_stack_event(
+                "OtherStack", "OtherStack", "CREATE_IN_PROGRESS", at(5)
+            ),
+        ],
+    )
+    assert history.sync(fake_cloudformation_client.client, "OtherStack") == 2
+    assert [(run["stack_name"], run["operation"]) for run in history.deploys()] == [
+        ("MyStack", "CREATE"),
+        ("OtherStack", "CREATE"),
+        ("MyStack", "UPDATE"),
+    ]
+
+    assert history.slowest_resource_types() == [
+        {
+            "resource_type": "AWS::SQS::Queue",
+            "count": 1,
+            "average_duration": 40,
+            "max_duration": 40,
+        }
+    ]
+    assert history.failure_reasons() == [
+        {"reason": "Queue name already exists", "count": 1}
+    ]
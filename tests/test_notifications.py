@@ -0,0 +1,178 @@
+# pylint:disable=redefined-outer-name,duplicate-code
+import sys
+from typing import Dict, List
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from cfn_sync import cloudformation
+from cfn_sync.notifications import NotificationListener, parse_notification
+
+from .conftest import StubbedClient
+from .stubs import (
+    generate_notification,
+    generate_stack_id,
+    stub_describe_stack,
+    stub_describe_stack_events,
+    stub_update_stack,
+)
+
+
+class FakeSqs:
+    """A local, in-memory stand-in for the SQS client"""
+
+    def __init__(self):
+        self.messages: List[Dict] = []
+        self.deleted: List[str] = []
+        self.receives: Dict[str, int] = {}
+
+    def receive_message(self, **_) -> Dict:
+        """Returns up to 10 messages that have not been deleted, counting how many times each was received"""
+        messages = [
+            message
+            for message in self.messages
+            if message["ReceiptHandle"] not in self.deleted
+        ][:10]
+        for message in messages:
+            count = self.receives.get(message["ReceiptHandle"], 0) + 1
+            self.receives[message["ReceiptHandle"]] = count
+            message["Attributes"] = {"ApproximateReceiveCount": str(count)}
+
+        return {"Messages": messages}
+
+    def delete_message_batch(
+        self, Entries: List[Dict], **_
+    ):  # pylint: disable=invalid-name
+        """Deletes the messages"""
+        self.deleted.extend(entry["ReceiptHandle"] for entry in Entries)
+
+
+@pytest.fixture
+def sqs() -> FakeSqs:
+    """Create a fake SQS client"""
+    return FakeSqs()
+
+
+@pytest.fixture
+def listener(sqs: FakeSqs) -> NotificationListener:
+    """Create a NotificationListener on the fake SQS client"""
+    return NotificationListener(sqs, "https://sqs/queue", wait_time_seconds=0)
+
+
+def test_parse_notification():
+    """Tests parse_notification() with SNS-wrapped and raw messages"""
+    message = generate_notification("MyStack", "Something", "CREATE_COMPLETE")
+    event = parse_notification(message["Body"])
+
+    assert event["StackId"] == generate_stack_id("MyStack")
+    assert event["LogicalResourceId"] == "Something"
+    assert event["ResourceStatus"] == "CREATE_COMPLETE"
+    assert "ResourceStatusReason" not in event
+    assert "PhysicalResourceId" not in event
+
+    raw = "EventId='abc'\nLogicalResourceId='Thing'\nResourceStatus='CREATE_FAILED'\n"
+    assert parse_notification(raw)["LogicalResourceId"] == "Thing"
+
+    with pytest.raises(ValueError):
+        parse_notification('{"Message": "Hello"}')
+
+
+def test_poll_demultiplexes(sqs: FakeSqs, listener: NotificationListener):
+    """Tests NotificationListener.poll() hands events to the registered stack, leaving others on the queue"""
+    mine = generate_notification("MyStack", "Something", "CREATE_COMPLETE")
+    other = generate_notification("OtherStack", "Something", "CREATE_COMPLETE")
+    sqs.messages.extend(
+        [mine, other, {"MessageId": "x", "ReceiptHandle": "y", "Body": "?"}]
+    )
+
+    my_events = listener.register("MyStack")
+    assert listener.poll() == 1
+    assert my_events.get_nowait()["StackName"] == "MyStack"
+    assert sqs.deleted == [mine["ReceiptHandle"]]
+
+    other_events = listener.register(generate_stack_id("OtherStack"))
+    assert listener.poll() == 1
+    assert other_events.get_nowait()["StackName"] == "OtherStack"
+
+    listener.unregister("MyStack")
+    sqs.messages.append(
+        generate_notification("MyStack", "Something", "DELETE_COMPLETE")
+    )
+    assert listener.poll() == 0
+
+
+def test_poll_deletes_unclaimed_events(sqs: FakeSqs, listener: NotificationListener):
+    """Tests NotificationListener.poll() deletes events nobody claims once they have been received max_receives
+    times"""
+    listener.register("MyStack")
+    listener.unregister("MyStack")
+    late = generate_notification("MyStack", "Something", "DELETE_COMPLETE")
+    sqs.messages.append(late)
+
+    for _ in range(listener.max_receives - 1):
+        assert listener.poll() == 0
+        assert not sqs.deleted
+
+    assert listener.poll() == 0
+    assert sqs.deleted == [late["ReceiptHandle"]]
+
+
+@patch("time.sleep")
+def test_deploy_wait_with_notifications(
+    patched_sleep: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    sqs: FakeSqs,
+    listener: NotificationListener,
+    demo_template: str,
+):
+    """Tests Stack.deploy(wait=True) attaches notification ARNs and waits on pushed events without polling"""
+    stack = cloudformation.Stack(fake_cloudformation_client.client, "MyStack")
+    stack.set_notifications(
+        ["arn:aws:sns:ap-southeast-2:123456789012:events"], listener
+    )
+
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    stub_update_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        demo_template,
+        [{"ParameterKey": "MyParam", "ParameterValue": "Value"}],
+        [],
+        notification_arns=["arn:aws:sns:ap-southeast-2:123456789012:events"],
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack", True)
+
+    sqs.messages.extend(
+        [
+            generate_notification("MyStack", "Something", "UPDATE_COMPLETE"),
+            generate_notification("MyStack", "MyStack", "UPDATE_COMPLETE"),
+        ]
+    )
+    # The fake queue has no visibility timeout, so don't let the events expire before the deploy starts waiting
+    listener.max_receives = sys.maxsize
+    listener.start()
+
+    stack.deploy(demo_template, {"MyParam": "Value"}, {}, True)
+    listener.stop()
+    patched_sleep.assert_not_called()
+
+
+@patch("time.monotonic")
+def test_wait_consistency_check(
+    patched_monotonic: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    listener: NotificationListener,
+):
+    """Tests Stack.wait() falls back to polling when no notifications arrive"""
+    patched_monotonic.return_value = 0
+    listener.consistency_check_interval = 0
+    stack = cloudformation.Stack(fake_cloudformation_client.client, "MyStack")
+    stack.set_notifications([], listener)
+
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "CREATE_IN_PROGRESS"
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE")
+    stack.wait()
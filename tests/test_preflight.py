@@ -0,0 +1,87 @@
+import json
+import time
+
+import pytest
+
+from cfn_sync.preflight import PreflightError, check_template, preflight
+
+
+def test_check_template_valid(demo_template: str):
+    """Tests check_template() passes a valid template"""
+    assert not check_template(demo_template)
+    preflight(demo_template)
+
+
+def test_check_template_references():
+    """Tests check_template() reports every missing reference and circular dependency together"""
+    template = """
+Parameters:
+  Name:
+    Type: String
+Resources:
+  First:
+    Type: AWS::SNS::Topic
+    DependsOn: Second
+    Properties:
+      TopicName: !Sub "${Name}-${AWS::Region}-${Missing}-${!Literal}"
+  Second:
+    Type: AWS::SNS::Topic
+    Properties:
+      TopicName: !GetAtt First.TopicName
+      DisplayName: !Ref Unknown
+  Third:
+    Type: AWS::SNS::Topic
+    DependsOn: [Nowhere]
+Outputs:
+  Arn:
+    Value: !GetAtt Gone.Arn
+"""
+    assert check_template(template) == [
+        "Resource First refers to Missing, which is not a parameter or resource",
+        "Resource Second refers to Unknown, which is not a parameter or resource",
+        "Resource Third DependsOn Nowhere, which is not a resource",
+        "Outputs section refers to Gone, which is not defined",
+        "Circular dependency between resources: First -> Second -> First",
+    ]
+
+    with pytest.raises(PreflightError, match="Circular dependency"):
+        preflight(template)
+
+
+def test_check_template_limits():
+    """Tests check_template() reports templates over CloudFormation's limits, and duplicate keys"""
+    resources = {
+        f"Topic{index}": {"Type": "AWS::SNS::Topic", "Properties": {"TopicName": "x"}}
+        for index in range(501)
+    }
+    body = json.dumps({"Description": "x" * 51200, "Resources": resources})
+    body = body[:-2] + ', "Topic0": {"Type": "AWS::SNS::Topic"}}}'
+
+    violations = check_template(body)
+    assert violations[0].startswith("Template body is ")
+    assert violations[1:] == [
+        "Duplicate key: Topic0",
+        "Template has 501 Resources, over the limit of 500",
+    ]
+
+    assert (
+        check_template("Resources:\n  A: 1\n  A: 2\n")[0] == "Duplicate key: A (line 3)"
+    )
+    assert check_template("Resources: [")[0].startswith("Unable to parse template")
+
+
+def test_check_template_linear():
+    """Tests check_template() handles a long dependency chain in a large template quickly"""
+    resources = {
+        f"Topic{index}": {
+            "Type": "AWS::SNS::Topic",
+            "DependsOn": [f"Topic{index - 1}"] if index else [],
+            "Properties": {"TopicName": {"Fn::Sub": "${AWS::StackName}-" + "x" * 100}},
+        }
+        for index in range(20000)
+    }
+    started = time.perf_counter()
+    violations = check_template(json.dumps({"Resources": resources}))
+    assert time.perf_counter() - started < 5
+    assert violations[1] == "Template has 20000 Resources, over the limit of 500"
+    assert len(violations) == 2
@@ -0,0 +1,122 @@
+# pylint:disable=redefined-outer-name
+import logging
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from cfn_sync.events import StackEvent
+from cfn_sync.progress import DurationModel, ProgressTracker
+
+from .stubs import at, generate_stack_event
+
+
+def deploy_events(queue_duration: int, bucket_duration: int) -> list:
+    """Generate the events of a stack update that changes a queue and a bucket"""
+    return [
+        generate_stack_event("MyStack", "MyStack", "UPDATE_IN_PROGRESS", at(0)),
+        generate_stack_event(
+            "MyStack", "Queue", "UPDATE_IN_PROGRESS", at(1), "AWS::SQS::Queue"
+        ),
+        generate_stack_event(
+            "MyStack", "Bucket", "UPDATE_IN_PROGRESS", at(1), "AWS::S3::Bucket"
+        ),
+        generate_stack_event(
+            "MyStack",
+            "Queue",
+            "UPDATE_COMPLETE",
+            at(1 + queue_duration),
+            "AWS::SQS::Queue",
+        ),
+        generate_stack_event(
+            "MyStack",
+            "Bucket",
+            "UPDATE_COMPLETE",
+            at(1 + bucket_duration),
+            "AWS::S3::Bucket",
+        ),
+        generate_stack_event(
+            "MyStack", "MyStack", "UPDATE_COMPLETE", at(2 + bucket_duration)
+        ),
+    ]
+
+
+@pytest.fixture
+def model(tmp_path) -> DurationModel:
+    """Create a DurationModel in a temporary directory"""
+    return DurationModel(str(tmp_path / "cache" / "durations.json"))
+
+
+def test_model_averages(model: DurationModel):
+    """Tests DurationModel running averages, lookups and persistence"""
+    assert model.expected("MyStack", "Queue", "AWS::SQS::Queue") is None
+    assert model.expected_stack("MyStack") is None
+
+    model.observe("MyStack", "Queue", "AWS::SQS::Queue", 10)
+    model.observe("MyStack", "Queue", "AWS::SQS::Queue", 20)
+    model.observe_stack("MyStack", 30, 4)
+    model.save()
+
+    reloaded = DurationModel(model.path)
+    assert reloaded.expected("MyStack", "Queue", None) == 15
+    assert reloaded.expected("OtherStack", "Other", "AWS::SQS::Queue") == 15
+    assert reloaded.expected("OtherStack", "Other", None) is None
+    assert reloaded.expected_stack("MyStack") == (30, 4)
+
+
+def test_model_ignores_unreadable_file(model: DurationModel):
+    """Tests DurationModel starts empty when its file is corrupt, e.g. half-written by a concurrent run"""
+    model.observe("MyStack", "Queue", "AWS::SQS::Queue", 10)
+    model.save()
+    with open(model.path, "r+", encoding="utf-8") as durations_file:
+        durations_file.truncate(10)
+
+    corrupt = DurationModel(model.path)
+    assert corrupt.expected("MyStack", "Queue", None) is None
+
+    corrupt.observe("MyStack", "Queue", "AWS::SQS::Queue", 20)
+    corrupt.save()
+    assert DurationModel(model.path).expected("MyStack", "Queue", None) == 20
+
+
+def test_tracker_learns_and_estimates(model: DurationModel, caplog):
+    """Tests ProgressTracker records a successful run and uses it to estimate the next"""
+    caplog.set_level(logging.INFO)
+
+    first = ProgressTracker(model, "MyStack")
+    for event in deploy_events(10, 60):
+        first.on_event(StackEvent(event))
+    first.on_finish("MyStack", "UPDATE_COMPLETE")
+    assert "Progress: 2 resources complete" in caplog.text
+
+    caplog.clear()
+    second = ProgressTracker(DurationModel(model.path), "MyStack")
+    for event in deploy_events(50, 60):
+        second.on_event(StackEvent(event))
+    second.on_finish("MyStack", "UPDATE_ROLLBACK_COMPLETE")
+
+    assert "Queue has been running for 50s, it usually takes 10s" in caplog.text
+    assert "Progress: 50% (1/2 resources), about 11s remaining" in caplog.text
+    assert DurationModel(model.path).expected("MyStack", "Queue", None) == 10
+
+
+@patch("time.time")
+def test_tracker_flags_slow_resources_while_polling(
+    patched_time: MagicMock, model: DurationModel, caplog
+):
+    """Tests ProgressTracker flags a stuck resource and refreshes its estimate on polls, without new events"""
+    caplog.set_level(logging.INFO)
+    model.observe("MyStack", "Queue", "AWS::SQS::Queue", 10)
+    model.observe_stack("MyStack", 20, 1)
+
+    tracker = ProgressTracker(model, "MyStack")
+    for event in deploy_events(50, 60)[:2]:
+        tracker.on_event(StackEvent(event))
+
+    patched_time.return_value = at(15).timestamp()
+    tracker.on_poll("MyStack", "UPDATE_IN_PROGRESS")
+    assert "Queue has been running" not in caplog.text
+    assert "Progress: 0% (0/1 resources), about 5s remaining" in caplog.text
+
+    patched_time.return_value = at(31).timestamp()
+    tracker.on_poll("MyStack", "UPDATE_IN_PROGRESS")
+    assert "Queue has been running for 30s, it usually takes 10s" in caplog.text
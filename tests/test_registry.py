@@ -0,0 +1,176 @@
+# pylint:disable=redefined-outer-name
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError  # type: ignore
+
+from cfn_sync import cloudformation
+from cfn_sync.registry import StackRegistry
+
+from .conftest import StubbedClient
+from .stubs import (
+    generate_stack_id,
+    stub_describe_stack,
+    stub_describe_stack_error,
+    stub_describe_stacks_page,
+    stub_update_stack,
+)
+
+
+@pytest.fixture
+def registry(fake_cloudformation_client: StubbedClient) -> StackRegistry:
+    """Create a StackRegistry on the stubbed client"""
+    return StackRegistry(fake_cloudformation_client.client, ttl=10, bulk_threshold=2)
+
+
+@patch("time.monotonic")
+def test_describe_caches_until_ttl(
+    patched_monotonic: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+    registry: StackRegistry,
+):
+    """Tests StackRegistry.describe() serves fresh entries by name and ID from the cache"""
+    patched_monotonic.return_value = 100
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "UPDATE_COMPLETE")
+    assert registry.describe("MyStack")["StackStatus"] == "UPDATE_COMPLETE"
+    assert registry.describe("MyStack")["StackStatus"] == "UPDATE_COMPLETE"
+    assert (
+        registry.describe(generate_stack_id("MyStack"))["StackStatus"]
+        == "UPDATE_COMPLETE"
+    )
+
+    patched_monotonic.return_value = 110
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "DELETE_COMPLETE")
+    assert registry.describe("MyStack")["StackStatus"] == "DELETE_COMPLETE"
+
+    registry.invalidate("MyStack")
+    stub_describe_stack_error(fake_cloudformation_client.stub)
+    with pytest.raises(ClientError):
+        registry.describe("MyStack")
+
+
+def test_describe_refreshes_in_bulk(
+    fake_cloudformation_client: StubbedClient, registry: StackRegistry
+):
+    """Tests StackRegistry.describe() describes every stack at once when several waiting stacks are stale"""
+    for stack_name in ("First", "Second", "Third"):
+        registry.track(stack_name)
+
+    stub_describe_stacks_page(
+        fake_cloudformation_client.stub,
+        [
+            {"StackName": "First", "StackStatus": "UPDATE_IN_PROGRESS"},
+            {"StackName": "Second", "StackStatus": "CREATE_IN_PROGRESS"},
+        ],
+        "page-2",
+    )
+    stub_describe_stacks_page(
+        fake_cloudformation_client.stub,
+        [{"StackName": "Unrelated", "StackStatus": "CREATE_COMPLETE"}],
+        token="page-2",
+    )
+    # Third was deleted, so is missing from the bulk refresh
+    stub_describe_stack(fake_cloudformation_client.stub, "Third", "DELETE_COMPLETE")
+
+    assert registry.describe("Third")["StackStatus"] == "DELETE_COMPLETE"
+    assert registry.describe("First")["StackStatus"] == "UPDATE_IN_PROGRESS"
+    assert registry.describe("Second")["StackStatus"] == "CREATE_IN_PROGRESS"
+
+    registry.untrack("Second")
+    registry.untrack("Third")
+    registry.invalidate("First")
+    stub_describe_stack(fake_cloudformation_client.stub, "First", "UPDATE_COMPLETE")
+    assert registry.describe("First")["StackStatus"] == "UPDATE_COMPLETE"
+
+
+class GatedScheduler:
+    """A scheduler that holds every API call until released"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def acquire(self):
+        """Blocks until released"""
+        self.entered.set()
+        self.released.wait(5)
+
+
+def test_bulk_refresh_is_shared_and_not_locked(
+    fake_cloudformation_client: StubbedClient,
+):
+    """Tests a bulk refresh runs without holding the cache lock, and concurrent callers wait for it rather than
+    starting another"""
+    scheduler = GatedScheduler()
+    registry = StackRegistry(
+        fake_cloudformation_client.client, ttl=10, bulk_threshold=2, scheduler=scheduler
+    )
+    for stack_name in ("First", "Second"):
+        registry.track(stack_name)
+
+    stub_describe_stacks_page(
+        fake_cloudformation_client.stub,
+        [
+            {"StackName": "First", "StackStatus": "UPDATE_IN_PROGRESS"},
+            {"StackName": "Second", "StackStatus": "CREATE_IN_PROGRESS"},
+        ],
+    )
+
+    statuses = {}
+
+    def describe(stack_name: str):
+        statuses[stack_name] = registry.describe(stack_name)["StackStatus"]
+
+    threads = [
+        threading.Thread(target=describe, args=(stack_name,))
+        for stack_name in ("First", "Second")
+    ]
+    threads[0].start()
+    assert scheduler.entered.wait(5)
+    threads[1].start()
+
+    # The cache isn't locked while the refresh is held up
+    invalidate = threading.Thread(target=registry.invalidate, args=("Unrelated",))
+    invalidate.start()
+    invalidate.join(5)
+    assert not invalidate.is_alive()
+
+    scheduler.released.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert statuses == {"First": "UPDATE_IN_PROGRESS", "Second": "CREATE_IN_PROGRESS"}
+
+
+def test_stack_invalidates_after_update(
+    fake_cloudformation_client: StubbedClient,
+    registry: StackRegistry,
+    demo_template: str,
+):
+    """Tests Stack reads through the registry, and invalidates it after a mutating call"""
+    stack = cloudformation.Stack(
+        fake_cloudformation_client.client, "MyStack", registry=registry
+    )
+    stub_describe_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        "UPDATE_COMPLETE",
+        parameters={"MyParam": "Old"},
+    )
+    assert stack.exists
+
+    # The cached description supplies the previous parameters
+    stub_update_stack(
+        fake_cloudformation_client.stub,
+        "MyStack",
+        demo_template,
+        [{"ParameterKey": "MyParam", "UsePreviousValue": True}],
+        [],
+    )
+    stack.deploy(demo_template, {}, {}, False)
+
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_IN_PROGRESS", True
+    )
+    assert stack.status == "UPDATE_IN_PROGRESS"
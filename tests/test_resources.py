@@ -0,0 +1,56 @@
+from cfn_sync.events import StackEvent
+from cfn_sync.resources import ResourceIndex
+
+from .stubs import START, at, generate_stack_event
+
+
+def test_resource_index():
+    """Tests ResourceIndex tracks each resource's status, type and start time from events"""
+    index = ResourceIndex()
+    events = [
+        generate_stack_event("MyStack", "MyStack", "UPDATE_IN_PROGRESS", START),
+        generate_stack_event(
+            "MyStack", "Queue", "UPDATE_IN_PROGRESS", START, "AWS::SQS::Queue"
+        ),
+        generate_stack_event(
+            "MyStack",
+            "Bucket",
+            "UPDATE_IN_PROGRESS",
+            at(1),
+            "AWS::S3::Bucket",
+        ),
+        generate_stack_event(
+            "MyStack",
+            "Queue",
+            "UPDATE_IN_PROGRESS",
+            at(2),
+            "AWS::SQS::Queue",
+            "Still going",
+        ),
+    ]
+    assert index.update(StackEvent(events[0])) is None
+    for event in events[1:]:
+        index.update(StackEvent(event))
+
+    assert len(index) == 2
+    assert index.counts() == {"UPDATE_IN_PROGRESS": 2}
+    assert index.in_progress() == ["Queue", "Bucket"]
+    assert index["Queue"].resource_type == "AWS::SQS::Queue"
+    assert index["Queue"].started == START.timestamp()
+    assert index["Queue"].reason == "Still going"
+
+    failed = generate_stack_event(
+        "MyStack",
+        "Queue",
+        "UPDATE_FAILED",
+        at(3),
+        "AWS::SQS::Queue",
+        "Broken",
+    )
+    assert index.update(StackEvent(failed)).status == "UPDATE_FAILED"
+    assert index.counts() == {"UPDATE_IN_PROGRESS": 1, "UPDATE_FAILED": 1}
+    assert index.in_progress(1) == ["Bucket"]
+    assert index.failed() == ["Queue"]
+
+    index.clear()
+    assert not index.counts() and "Queue" not in index
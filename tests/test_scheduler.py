@@ -0,0 +1,35 @@
+from unittest.mock import MagicMock, patch
+
+from cfn_sync.scheduler import Scheduler
+
+
+@patch("time.sleep")
+def test_acquire_within_burst(patched_sleep: MagicMock):
+    """Tests Scheduler.acquire() does not wait while within the burst"""
+    scheduler = Scheduler(calls_per_second=1, burst=3)
+    for _ in range(3):
+        scheduler.acquire()
+
+    patched_sleep.assert_not_called()
+
+
+@patch("time.monotonic")
+@patch("time.sleep")
+def test_acquire_waits_for_budget(
+    patched_sleep: MagicMock, patched_monotonic: MagicMock
+):
+    """Tests Scheduler.acquire() waits for the budget to refill once the burst is spent"""
+    clock = [100.0]
+    patched_monotonic.side_effect = lambda: clock[0]
+
+    def advance(delay: float):
+        clock[0] += delay
+
+    patched_sleep.side_effect = advance
+
+    scheduler = Scheduler(calls_per_second=2, burst=1)
+    scheduler.acquire()
+    patched_sleep.assert_not_called()
+
+    scheduler.acquire()
+    patched_sleep.assert_called_once_with(0.5)
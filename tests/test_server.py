@@ -0,0 +1,135 @@
+# pylint:disable=redefined-outer-name
+import argparse
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from cfn_sync import check_server_options, server
+from cfn_sync.cloudformation import StackTimeoutError
+from cfn_sync.scheduler import Scheduler
+
+from .conftest import StubbedClient
+from .stubs import stub_describe_stack, stub_describe_stack_events
+
+
+@pytest.fixture
+def jobs(fake_cloudformation_client: StubbedClient) -> server.JobServer:
+    """Create a JobServer on the stubbed client"""
+    return server.JobServer(fake_cloudformation_client.client, Scheduler())
+
+
+def test_parse_address():
+    """Tests parse_address() for TCP and Unix socket addresses"""
+    assert server.parse_address("127.0.0.1:8080") == ("127.0.0.1", 8080)
+    assert server.parse_address("localhost:80") == ("localhost", 80)
+    assert server.parse_address("/tmp/cfn-sync.sock") == "/tmp/cfn-sync.sock"
+    assert server.parse_address("cfn-sync.sock") == "cfn-sync.sock"
+
+
+def test_check_server_options():
+    """Tests check_server_options() rejects options the server would silently ignore"""
+    parser = argparse.ArgumentParser()
+    check_server_options(
+        parser, {"output": "events", "capabilities": ["CAPABILITY_IAM"]}
+    )
+    check_server_options(
+        parser, {"watch_files": [], "progress": False, "notification_queue_url": None}
+    )
+
+    with pytest.raises(SystemExit):
+        check_server_options(parser, {"watch_files": ["template.yml"]})
+    with pytest.raises(SystemExit):
+        check_server_options(parser, {"output": "summary"})
+
+
+def test_create_server_rejects_unsafe_addresses(jobs: server.JobServer, tmp_path):
+    """Tests create_server() refuses non-loopback hosts, and paths that aren't sockets"""
+    with pytest.raises(ValueError, match="loopback"):
+        server.create_server("0.0.0.0:8000", jobs)
+
+    with pytest.raises(ValueError, match="loopback"):
+        server.create_server("example.com:8000", jobs)
+
+    not_a_socket = tmp_path / "important.txt"
+    not_a_socket.write_text("keep me")
+    with pytest.raises(ValueError, match="not a socket"):
+        server.create_server(str(not_a_socket), jobs)
+
+    assert not_a_socket.read_text() == "keep me"
+
+
+def test_job_fan_out():
+    """Tests Job replays earlier messages to late subscribers and releases them when finished"""
+    job = server.Job("deploy", "MyStack")
+    early = job.subscribe()
+    job.publish({"event": 1})
+    late = job.subscribe()
+    job.publish({"event": 2})
+    job.finish({"result": "success"})
+
+    assert list(iter(early.get, None)) == [{"event": 1}, {"event": 2}]
+    assert list(iter(late.get, None)) == [{"event": 1}, {"event": 2}]
+    assert list(iter(job.subscribe().get, None)) == [{"event": 1}, {"event": 2}]
+
+
+def test_submit_invalid(jobs: server.JobServer):
+    """Tests JobServer.submit() rejects invalid requests"""
+    with pytest.raises(ValueError):
+        jobs.submit({"action": "explode", "stack_name": "MyStack"})
+
+    with pytest.raises(ValueError):
+        jobs.submit({"action": "watch"})
+
+
+def test_unexpected_failure_releases_subscribers(jobs: server.JobServer):
+    """Tests a job that raises an unexpected exception still finishes, releasing its subscribers"""
+    with patch.object(server.Stack, "wait", side_effect=OSError("Network is down")):
+        job = jobs.submit({"action": "watch", "stack_name": "MyStack"})
+        assert job.subscribe().get(timeout=5) is None
+
+    assert job.result is not None
+    assert job.result["result"] == "failure"
+    assert "Network is down" in job.result["error"]
+
+
+def test_watch_over_socket(
+    fake_cloudformation_client: StubbedClient, jobs: server.JobServer, tmp_path
+):
+    """Tests a watch job submitted through a Unix socket streams events and succeeds"""
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE")
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+
+    address = str(tmp_path / "cfn-sync.sock")
+    with server.create_server(address, jobs) as job_server:
+        thread = threading.Thread(target=job_server.serve_forever, daemon=True)
+        thread.start()
+
+        assert server.submit(address, {"action": "watch", "stack_name": "MyStack"})
+        assert not server.submit(address, {"action": "explode", "stack_name": "X"})
+
+        job_server.shutdown()
+
+
+def test_watch_timeout_over_socket(
+    fake_cloudformation_client: StubbedClient, jobs: server.JobServer, tmp_path
+):
+    """Tests a watch job that passes its deadline raises StackTimeoutError on the client"""
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "CREATE_IN_PROGRESS"
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+
+    address = str(tmp_path / "cfn-sync.sock")
+    with server.create_server(address, jobs) as job_server:
+        thread = threading.Thread(target=job_server.serve_forever, daemon=True)
+        thread.start()
+
+        with pytest.raises(StackTimeoutError, match="CREATE_IN_PROGRESS"):
+            server.submit(
+                address,
+                {"action": "watch", "stack_name": "MyStack", "deadline": time.time()},
+            )
+
+        job_server.shutdown()
@@ -0,0 +1,192 @@
+# pylint:disable=duplicate-code
+import threading
+from typing import List
+from unittest.mock import MagicMock, patch
+
+from cfn_sync import cloudformation
+from cfn_sync.events import StackEvent
+from cfn_sync.sinks import EventSink, ThreadedSink
+
+from .conftest import StubbedClient
+from .stubs import (
+    START,
+    generate_stack_event,
+    stub_describe_stack,
+    stub_describe_stack_events,
+    stub_describe_stack_events_page,
+)
+
+
+class RecordingSink(EventSink):
+    """Sink that records each callback it receives"""
+
+    def __init__(self):
+        self.calls_received: List[tuple] = []
+
+    def on_event(self, event: StackEvent):
+        self.calls_received.append(("event", event.resource_status))
+
+    def on_status_change(self, stack_name: str, stack_status: str):
+        self.calls_received.append(("status", stack_status))
+
+    def on_finish(self, stack_name: str, stack_status: str):
+        self.calls_received.append(("finish", stack_status))
+
+
+class PollCountingSink(EventSink):
+    """Sink that counts how many times the stack was polled"""
+
+    def __init__(self):
+        self.polls = 0
+
+    def on_poll(self, stack_name: str, stack_status: str):
+        self.polls += 1
+
+
+class BlockingSink(EventSink):
+    """Sink whose callbacks wait until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.events: List[StackEvent] = []
+        self.finished: List[str] = []
+
+    def on_event(self, event: StackEvent):
+        self.release.wait()
+        self.events.append(event)
+
+    def on_finish(self, stack_name: str, stack_status: str):
+        self.finished.append(stack_status)
+
+
+class BrokenSink(EventSink):
+    """Sink that fails on every event"""
+
+    def on_event(self, event: StackEvent):
+        raise ValueError("Broken")
+
+
+def make_event() -> StackEvent:
+    """Generate a resource event"""
+    return StackEvent(
+        generate_stack_event("MyStack", "Queue", "CREATE_IN_PROGRESS", START)
+    )
+
+
+def test_deliver_accounts_and_isolates_failures(caplog):
+    """Tests EventSink.deliver() times each callback and logs, rather than raises, failures"""
+    sink = BrokenSink()
+    sink.deliver("on_event", make_event())
+    sink.deliver("on_finish", "MyStack", "CREATE_COMPLETE")
+
+    assert sink.calls == 2
+    assert sink.elapsed > 0
+    assert "Event sink BrokenSink failed in on_event" in caplog.text
+
+
+def test_threaded_sink_never_blocks():
+    """Tests ThreadedSink hands callbacks to its own thread, dropping them once its queue is full"""
+    blocking = BlockingSink()
+    sink = ThreadedSink(blocking, queue_size=2)
+
+    for _ in range(5):
+        sink.deliver("on_event", make_event())
+
+    assert sink.name == "BlockingSink"
+    assert sink.dropped >= 2
+
+    blocking.release.set()
+    sink.close(timeout=5)
+    assert len(blocking.events) == 5 - sink.dropped
+    assert sink.elapsed == blocking.elapsed
+
+
+def test_threaded_sink_keeps_lifecycle_callbacks():
+    """Tests ThreadedSink never drops the final status, even when its queue is full, and can be flushed"""
+    blocking = BlockingSink()
+    sink = ThreadedSink(blocking, queue_size=1)
+
+    for _ in range(5):
+        sink.deliver("on_event", make_event())
+    sink.deliver("on_finish", "MyStack", "CREATE_COMPLETE")
+
+    assert sink.dropped >= 3
+    assert not sink.flush(timeout=0.1)
+
+    blocking.release.set()
+    assert sink.flush(timeout=5)
+    assert blocking.finished == ["CREATE_COMPLETE"]
+    sink.close(timeout=5)
+
+
+@patch("time.sleep")
+def test_wait_flushes_threaded_sinks(
+    _: MagicMock, fake_cloudformation_client: StubbedClient
+):
+    """Tests Stack.wait() doesn't return until threaded sinks have handled the final status"""
+    recording = RecordingSink()
+    stack = cloudformation.Stack(
+        fake_cloudformation_client.client, "MyStack", sinks=[ThreadedSink(recording)]
+    )
+
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "DELETE_COMPLETE")
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, "MyStack", [])
+
+    assert stack.wait() == "DELETE_COMPLETE"
+    assert recording.calls_received == [
+        ("status", "DELETE_COMPLETE"),
+        ("finish", "DELETE_COMPLETE"),
+    ]
+
+
+@patch("time.sleep")
+def test_wait_sinks(
+    patched_sleep: MagicMock,
+    fake_cloudformation_client: StubbedClient,
+):
+    """Tests Stack.wait() passes events, status changes and the final status to sinks and on_event"""
+    sink = RecordingSink()
+    stack = cloudformation.Stack(
+        fake_cloudformation_client.client, "MyStack", sinks=[sink]
+    )
+    received: List[StackEvent] = []
+
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "CREATE_IN_PROGRESS"
+    )
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+    stub_describe_stack_events(fake_cloudformation_client.stub, "MyStack")
+    stub_describe_stack(fake_cloudformation_client.stub, "MyStack", "CREATE_COMPLETE")
+
+    assert stack.wait(on_event=received.append) == "CREATE_COMPLETE"
+    patched_sleep.assert_called_once()
+
+    assert sink.calls_received[0] == ("status", "CREATE_IN_PROGRESS")
+    assert sink.calls_received[-2:] == [
+        ("status", "CREATE_COMPLETE"),
+        ("finish", "CREATE_COMPLETE"),
+    ]
+    assert [("event", event.resource_status) for event in received] == [
+        call for call in sink.calls_received if call[0] == "event"
+    ]
+    assert stack.sinks == [sink]
+
+
+@patch("time.sleep")
+def test_wait_polls_sinks(_: MagicMock, fake_cloudformation_client: StubbedClient):
+    """Tests Stack.wait() tells sinks about every poll, including those with no new events or status change"""
+    sink = PollCountingSink()
+    stack = cloudformation.Stack(
+        fake_cloudformation_client.client, "MyStack", sinks=[sink]
+    )
+
+    stub_describe_stack(
+        fake_cloudformation_client.stub, "MyStack", "UPDATE_IN_PROGRESS"
+    )
+    stub_describe_stack_events_page(fake_cloudformation_client.stub, "MyStack", [])
+    for status in ("UPDATE_IN_PROGRESS", "UPDATE_COMPLETE"):
+        stub_describe_stack_events_page(fake_cloudformation_client.stub, "MyStack", [])
+        stub_describe_stack(fake_cloudformation_client.stub, "MyStack", status)
+
+    assert stack.wait() == "UPDATE_COMPLETE"
+    assert sink.polls == 3
@@ -0,0 +1,66 @@
+import logging
+
+from cfn_sync.events import StackEvent
+from cfn_sync.resources import ResourceIndex
+from cfn_sync.summary import SummaryReporter
+
+from .stubs import START, generate_stack_event
+
+
+def test_summary_reporter(caplog):
+    """Tests SummaryReporter logs failures immediately, and summaries only once the interval has passed"""
+    caplog.set_level(logging.INFO)
+    resources = ResourceIndex()
+    reporter = SummaryReporter(resources, interval=3600)
+
+    def emit(logical_resource_id: str, resource_status: str):
+        event = StackEvent(
+            generate_stack_event(
+                "MyStack",
+                logical_resource_id,
+                resource_status,
+                START,
+                "AWS::SQS::Queue",
+            )
+        )
+        resources.update(event)
+        reporter.on_event(event)
+
+    emit("MyStack", "CREATE_IN_PROGRESS")
+    for number in range(12):
+        emit(f"Queue{number}", "CREATE_IN_PROGRESS")
+    emit("Queue0", "CREATE_FAILED")
+
+    assert "MyStack - CREATE_IN_PROGRESS" in caplog.text
+    assert "Queue0 - CREATE_FAILED" in caplog.text
+    assert "Queue1 - CREATE_IN_PROGRESS" not in caplog.text
+    assert "Summary" not in caplog.text
+
+    reporter.interval = 0
+    emit("Queue1", "CREATE_COMPLETE")
+    assert (
+        "Summary: 12 resources - 1 CREATE_COMPLETE, 1 CREATE_FAILED, 10 CREATE_IN_PROGRESS;"
+        " in progress: Queue2, Queue3, Queue4, Queue5, Queue6, Queue7, Queue8, Queue9, Queue10,"
+        " Queue11" in caplog.text
+    )
+
+
+def test_summary_reporter_on_poll(caplog):
+    """Tests SummaryReporter logs summaries while the stack is polled, even without new events"""
+    caplog.set_level(logging.INFO)
+    resources = ResourceIndex()
+    resources.update(
+        StackEvent(
+            generate_stack_event("MyStack", "Queue", "CREATE_IN_PROGRESS", START)
+        )
+    )
+    reporter = SummaryReporter(resources, interval=3600)
+
+    reporter.on_poll("MyStack", "CREATE_IN_PROGRESS")
+    assert "Summary" not in caplog.text
+
+    reporter.interval = 0
+    reporter.on_poll("MyStack", "CREATE_IN_PROGRESS")
+    assert (
+        "Summary: 1 resources - 1 CREATE_IN_PROGRESS; in progress: Queue" in caplog.text
+    )
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cfn_sync import template
+from cfn_sync.template import (
+    ParameterError,
+    TemplateError,
+    merge_parameters,
+    parse_template,
+)
+
+TEMPLATE = """
+Parameters:
+  Name:
+    Type: String
+Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: !Sub "${Name}-bucket"
+      Tags:
+        - Key: Arn
+          Value: !GetAtt Other.Arn
+        - Key: Ref
+          Value: !Ref Name
+        - Key: Joined
+          Value: !Join [",", [a, b]]
+"""
+
+
+def test_parse_template_intrinsics():
+    """Tests parse_template() expands the short form of intrinsic functions"""
+    properties = parse_template(TEMPLATE)["Resources"]["Bucket"]["Properties"]
+    assert properties["BucketName"] == {"Fn::Sub": "${Name}-bucket"}
+    assert [tag["Value"] for tag in properties["Tags"]] == [
+        {"Fn::GetAtt": ["Other", "Arn"]},
+        {"Ref": "Name"},
+        {"Fn::Join": [",", ["a", "b"]]},
+    ]
+
+
+def test_parse_template_cached():
+    """Tests parse_template() reuses the result for the same template, and parses JSON"""
+    assert parse_template(TEMPLATE) is parse_template(TEMPLATE)
+    assert parse_template('{"Resources": {}}') == {"Resources": {}}
+
+    with pytest.raises(TemplateError):
+        parse_template("Resources: [")
+
+
+def test_parse_template_cached_concurrently():
+    """Tests the parse cache stays bounded and consistent while templates are parsed from several threads"""
+    bodies = [f"Resources: {{Queue{index}: {{}}}}\n" for index in range(64)] * 4
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        parsed = list(executor.map(parse_template, bodies))
+
+    assert parsed == [{"Resources": {f"Queue{index % 64}": {}}} for index in range(256)]
+    # pylint: disable-next=protected-access
+    assert len(template._parsed_templates) <= template.CACHE_SIZE
+
+
+def test_merge_parameters():
+    """Tests merge_parameters() keeps previous values, leaves defaults alone and rejects invalid parameters"""
+    declared = {"Given": {}, "Previous": {}, "Defaulted": {"Default": "x"}}
+    assert merge_parameters(declared, {"Given": "1"}, ["Previous", "Defaulted"]) == [
+        {"ParameterKey": "Given", "ParameterValue": "1"},
+        {"ParameterKey": "Previous", "UsePreviousValue": True},
+        {"ParameterKey": "Defaulted", "UsePreviousValue": True},
+    ]
+
+    with pytest.raises(ParameterError, match="declared by the template: Unknown"):
+        merge_parameters(declared, {"Unknown": "1"}, ["Given", "Previous"])
+
+    with pytest.raises(ParameterError, match="without a value: Given, Previous"):
+        merge_parameters(declared, {}, [])
@@ -0,0 +1,107 @@
+# pylint:disable=redefined-outer-name
+import os
+from typing import List
+from unittest.mock import MagicMock
+
+import pytest
+
+from cfn_sync.watch import TemplateWatcher
+
+
+@pytest.fixture
+def template_path(tmp_path) -> str:
+    """Create a template file in a temporary directory"""
+    path = tmp_path / "template.yml"
+    path.write_text("Resources: {}\n")
+    return str(path)
+
+
+def save(path: str, content: str, mtime_ns: int):
+    """Writes a file, giving it a distinct modification time"""
+    with open(path, "w", encoding="utf-8") as saved_file:
+        saved_file.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_submit_skips_unchanged_content(template_path: str):
+    """Tests TemplateWatcher.submit() only queues content that differs from the last deploy"""
+    deploys: List[str] = []
+    watcher = TemplateWatcher([template_path], lambda: deploys.append("deploy"))
+
+    assert watcher.submit()
+    assert not watcher.submit()
+    assert watcher.deploy_pending()
+    assert not watcher.deploy_pending()
+    assert deploys == ["deploy"]
+
+
+def test_poll_debounces_and_coalesces(template_path: str):
+    """Tests TemplateWatcher.poll() waits for saves to settle, and only one deploy is queued"""
+    deploy = MagicMock()
+    watcher = TemplateWatcher([template_path], deploy, debounce=1)
+    watcher.submit()
+
+    save(template_path, "Resources: {A: 1}\n", 1_000_000_000)
+    watcher.poll(10.0)
+    save(template_path, "Resources: {A: 2}\n", 2_000_000_000)
+    watcher.poll(10.5)
+    watcher.poll(11.0)
+    watcher.poll(11.6)
+
+    assert watcher.deploy_pending()
+    assert not watcher.deploy_pending()
+    deploy.assert_called_once()
+
+    # saving identical content does not deploy again
+    save(template_path, "Resources: {A: 2}\n", 3_000_000_000)
+    watcher.poll(20.0)
+    watcher.poll(21.0)
+    assert not watcher.deploy_pending()
+
+
+def test_deploy_failure_keeps_watching(template_path: str):
+    """Tests a failed deploy does not stop the watcher"""
+    deploy = MagicMock(side_effect=RuntimeError("Stack did not deploy successfully"))
+    watcher = TemplateWatcher([template_path], deploy)
+    watcher.submit()
+
+    assert watcher.deploy_pending()
+    deploy.assert_called_once()
+
+    # the same content can be deployed again once the failure is fixed
+    assert watcher.submit()
+    assert watcher.deploy_pending()
+    assert deploy.call_count == 2
+
+
+def test_unexpected_deploy_failure_keeps_watching(template_path: str):
+    """Tests a deploy failing with an unexpected exception does not stop the watcher"""
+    deploy = MagicMock(side_effect=OSError("Parameter file not found"))
+    watcher = TemplateWatcher([template_path], deploy)
+    watcher.submit()
+    assert watcher.deploy_pending()
+
+    save(template_path, "Resources: {A: 1}\n", 1_000_000_000)
+    watcher.poll(10.0)
+    watcher.poll(20.0)
+    assert watcher.deploy_pending()
+    assert deploy.call_count == 2
+
+
+def test_poll_skips_missing_files(template_path: str):
+    """Tests TemplateWatcher.poll() doesn't deploy while a watched file is missing, e.g. during a rename-save"""
+    deploy = MagicMock()
+    watcher = TemplateWatcher([template_path], deploy)
+    watcher.submit()
+    assert watcher.deploy_pending()
+
+    os.unlink(template_path)
+    watcher.poll(10.0)
+    watcher.poll(20.0)
+    assert not watcher.deploy_pending()
+
+    save(template_path, "Resources: {A: 1}\n", 1_000_000_000)
+    watcher.poll(30.0)
+    watcher.poll(40.0)
+    assert watcher.deploy_pending()
+    assert deploy.call_count == 2